@@ -0,0 +1,97 @@
+import io
+import os
+import zipfile
+from collections import deque
+
+from pypdf import PdfReader, PdfWriter
+
+from database import Session
+from models import PatientInfo
+from pdf_service import PDF_WORKERS, create_merged_pdf, create_pdfs, get_pdf_executor, snapshot_patient_info
+
+# 1回のワーカー呼び出しでまとめて作成する計画書の件数
+BATCH_CHUNK_SIZE = 50
+# 1つのPDFにまとめる場合の最大件数。PdfWriter は全ページを保存までメモリに保持するため、
+# メモリ使用量が件数に比例しない ZIP（1件1ファイル）を月末の一括発行などの大量出力に使う
+MERGED_PDF_MAX_PLANS = int(os.environ.get("MERGED_PDF_MAX_PLANS", 2000))
+
+
+def query_plans(session, start_date=None, end_date=None, doctor_id=None, department=None):
+    query = session.query(PatientInfo)
+    if start_date:
+        query = query.filter(PatientInfo.issue_date >= start_date)
+    if end_date:
+        query = query.filter(PatientInfo.issue_date <= end_date)
+    if doctor_id:
+        query = query.filter(PatientInfo.doctor_id == doctor_id)
+    if department:
+        query = query.filter(PatientInfo.department == department)
+    return query.order_by(PatientInfo.issue_date, PatientInfo.id)
+
+
+def _iter_chunks(query, chunk_size):
+    # DBからは chunk_size 件ずつ読み込み、全件をメモリに載せない
+    chunk = []
+    for patient_info in query.yield_per(chunk_size):
+        chunk.append(snapshot_patient_info(patient_info))
+        if len(chunk) == chunk_size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def _render_chunks(chunks, render, max_pending):
+    # 出力順を保ったまま、同時に作成中のチャンク数を max_pending までに制限する
+    executor = get_pdf_executor()
+    pending = deque()
+    for chunk in chunks:
+        pending.append((chunk, executor.submit(render, chunk)))
+        if len(pending) >= max_pending:
+            done_chunk, future = pending.popleft()
+            yield done_chunk, future.result()
+    while pending:
+        done_chunk, future = pending.popleft()
+        yield done_chunk, future.result()
+
+
+def plan_file_name(patient_info):
+    issue_date = patient_info.issue_date.strftime("%Y%m%d") if patient_info.issue_date else "00000000"
+    return f"{issue_date}_{patient_info.patient_id}_{patient_info.id}_{patient_info.patient_name}.pdf"
+
+
+def batch_print(output_path, start_date=None, end_date=None, doctor_id=None, department=None, output_format="pdf",
+                chunk_size=BATCH_CHUNK_SIZE, progress=None):
+    # 条件に合う計画書をまとめて作成し、1つのPDF（output_format="pdf"）またはZIP（"zip"）に書き出す
+    session = Session()
+    try:
+        query = query_plans(session, start_date, end_date, doctor_id, department)
+        total = query.count()
+        if output_format != "zip" and total > MERGED_PDF_MAX_PLANS:
+            raise ValueError(f"{total}件は1つのPDFにまとめられません（上限 {MERGED_PDF_MAX_PLANS}件）。"
+                             "ZIP で出力してください")
+        done = 0
+        chunks = _iter_chunks(query, chunk_size)
+        max_pending = PDF_WORKERS * 2
+
+        if output_format == "zip":
+            # PDFは圧縮済みのため ZIP には無圧縮で格納する
+            with zipfile.ZipFile(output_path, "w", compression=zipfile.ZIP_STORED) as archive:
+                for chunk, pdfs in _render_chunks(chunks, create_pdfs, max_pending):
+                    for patient_info, pdf_data in zip(chunk, pdfs):
+                        archive.writestr(plan_file_name(patient_info), pdf_data)
+                    done += len(chunk)
+                    if progress:
+                        progress(done, total)
+        else:
+            writer = PdfWriter()
+            for chunk, pdf_data in _render_chunks(chunks, create_merged_pdf, max_pending):
+                writer.append(PdfReader(io.BytesIO(pdf_data)))
+                done += len(chunk)
+                if progress:
+                    progress(done, total)
+            with open(output_path, "wb") as f:
+                writer.write(f)
+    finally:
+        session.close()
+    return done
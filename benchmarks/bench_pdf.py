@@ -0,0 +1,42 @@
+import argparse
+import os
+import sys
+import time
+from datetime import date
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from models import PatientInfo  # noqa: E402
+from pdf_service import create_pdf  # noqa: E402
+
+
+def sample_patient_info(n):
+    return PatientInfo(
+        id=n, patient_id=n, patient_name=f"テスト患者{n}", kana="ﾃｽﾄｶﾝｼﾞｬ", gender="男性",
+        birthdate=date(1967, 10, 10), issue_date=date(2024, 4, 1), doctor_id=999, doctor_name="テスト医師",
+        department="内科", main_diagnosis="糖尿病", creation_count=1, target_weight=60.0, sheet_name="HbAc７％",
+        goal1="HbA1ｃ７％を目標/体重を当初の－３Kgとする", goal2="１日８０００歩以上の歩行/間食の制限/糖質の制限",
+        diet="・食事量を適正にする\n・食物繊維の摂取量を増やす", exercise_prescription="ウォーキング",
+        exercise_time="30分以上", exercise_frequency="ほぼ毎日", exercise_intensity="少し汗をかく程度",
+        daily_activity="1日8000歩以上", nonsmoker="True", smoking_cessation="False",
+        other1="睡眠の確保１日７時間", other2="家庭での毎日の歩数の測定",
+    )
+
+
+def main():
+    # 1プロセスで計画書PDFを連続作成し、1秒あたりの作成数を表示する
+    parser = argparse.ArgumentParser(description="計画書PDF作成のベンチマーク")
+    parser.add_argument("-n", "--count", type=int, default=200, help="作成するPDFの数")
+    args = parser.parse_args()
+
+    create_pdf(sample_patient_info(0))  # フォント読み込みなどの初回コストを除く
+    started = time.perf_counter()
+    total_bytes = 0
+    for n in range(args.count):
+        total_bytes += len(create_pdf(sample_patient_info(n)))
+    elapsed = time.perf_counter() - started
+    print(f"{args.count}件 {elapsed:.2f}秒 {args.count / elapsed:.1f}件/秒 平均{total_bytes / args.count / 1024:.1f}KB")
+
+
+if __name__ == "__main__":
+    main()
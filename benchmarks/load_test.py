@@ -0,0 +1,273 @@
+import argparse
+import asyncio
+import itertools
+import json
+import os
+import random
+import resource
+import sys
+import tempfile
+import time
+import tracemalloc
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import flet as ft  # noqa: E402
+from flet_core.connection import Connection  # noqa: E402
+from flet_core.page import Page  # noqa: E402
+from flet_core.protocol import CommandEncoder, PageCommandResponsePayload, PageCommandsBatchResponsePayload  # noqa: E402
+
+from synthetic_data import write_history_db, write_patient_csv  # noqa: E402
+
+
+class LoadTestConnection(Connection):
+    # ブラウザの代わりにコマンドを受け取り、送信回数と送信量だけを数える
+    def __init__(self):
+        super().__init__()
+        self.page_url = "http://localhost"
+        self._ids = itertools.count(1)
+        self.batches = 0
+        self.bytes = 0
+
+    def send_command(self, session_id, command):
+        return PageCommandResponsePayload(result="", error="")
+
+    def send_commands(self, session_id, commands):
+        self.batches += 1
+        self.bytes += len(json.dumps(commands, cls=CommandEncoder))
+        results = []
+        for command in commands:
+            if command.name == "add":
+                results.append(" ".join(f"_{next(self._ids)}" for _ in command.commands))
+        return PageCommandsBatchResponsePayload(results=results, error="")
+
+
+class LoadTestPage(Page):
+    # run_task / run_thread で投げられた処理（画面遷移、患者検索など）を待てるように控えておく
+    def __init__(self, conn, session_id, loop, executor):
+        super().__init__(conn, session_id, loop=loop, executor=executor)
+        self.thread_executor = executor
+        self.pending_tasks = []
+        # 印刷で開こうとしたPDFのURLとファイル名
+        self.launched_urls = []
+
+    def run_task(self, handler, *args, **kwargs):
+        future = super().run_task(handler, *args, **kwargs)
+        self.pending_tasks.append(future)
+        return future
+
+    def run_thread(self, handler, *args):
+        self.pending_tasks.append(self.thread_executor.submit(handler, *args))
+
+    def launch_url(self, url, web_window_name=None, *args, **kwargs):
+        self.launched_urls.append((url, web_window_name))
+
+    async def settle(self):
+        while self.pending_tasks:
+            await asyncio.wrap_future(self.pending_tasks.pop(0))
+        # まとめて送信する更新（UpdateBatcher）が残っていれば送信されるまで待つ
+        while getattr(getattr(self.update, "__self__", None), "pending", False):
+            await asyncio.sleep(0)
+
+
+def find_control(control, predicate):
+    if predicate(control):
+        return control
+    for child in control._get_children():
+        found = find_control(child, predicate)
+        if found is not None:
+            return found
+    return None
+
+
+def find_in_views(page, predicate):
+    for view in reversed(page.views):
+        found = find_control(view, predicate)
+        if found is not None:
+            return found
+    raise LookupError("画面の部品が見つかりません")
+
+
+def by_label(label):
+    return lambda control: getattr(control, "label", None) == label
+
+
+def by_button_text(text):
+    return lambda control: isinstance(control, ft.ElevatedButton) and control.text == text
+
+
+def percentile(values, p):
+    values = sorted(values)
+    index = min(len(values) - 1, max(0, round(p / 100 * len(values)) - 1))
+    return values[index]
+
+
+class SimulatedClinician:
+    # 1セッション分の画面を開き、実際の操作の流れ（患者ID入力→新規作成→主病名・シート名の選択→
+    # 発行→一覧から開いて保存→印刷）を繰り返して操作ごとの所要時間を記録する
+    def __init__(self, app, loop, executor, patient_ids, seed, think_time):
+        self.app = app
+        self.connection = LoadTestConnection()
+        self.page = LoadTestPage(self.connection, f"load-{seed}", loop=loop, executor=executor)
+        self.page._set_attr("route", "/", False)
+        self.rng = random.Random(seed)
+        self.patient_ids = patient_ids
+        self.think_time = think_time
+        self.timings = defaultdict(list)
+        self.messages = defaultdict(list)
+
+    async def open(self):
+        await self.app.main(self.page)
+        await self.page.settle()
+
+    async def timed(self, name, operation):
+        started = time.perf_counter()
+        batches = self.connection.batches
+        await operation()
+        await self.page.settle()
+        self.timings[name].append(time.perf_counter() - started)
+        self.messages[name].append(self.connection.batches - batches)
+        if self.think_time:
+            await asyncio.sleep(self.rng.uniform(0, self.think_time * 2))
+
+    async def click(self, text):
+        await self._call(find_in_views(self.page, by_button_text(text)).on_click)
+
+    async def _call(self, handler):
+        # 画面と同じく、コルーチンはイベントループで、通常の関数はスレッドで実行する
+        if asyncio.iscoroutinefunction(handler):
+            await handler(None)
+        else:
+            await asyncio.to_thread(handler, None)
+
+    async def type_patient_id(self, patient_id):
+        field = find_in_views(self.page, by_label("患者ID"))
+        field.value = str(patient_id)
+        started_tasks = len(self.page.pending_tasks)
+        await self._call(field.on_change)
+        # 入力の間引き（Debouncer）のタイマーが検索を投げるまで待つ
+        while len(self.page.pending_tasks) == started_tasks:
+            await asyncio.sleep(0.001)
+
+    async def select(self, label, value):
+        dropdown = find_in_views(self.page, by_label(label))
+        dropdown.value = value
+        await self._call(dropdown.on_change)
+
+    async def select_latest_plan(self):
+        history = find_in_views(self.page, lambda control: isinstance(control, ft.DataTable))
+        if not history.rows:
+            return
+        row = history.rows[0]
+        await row.on_select_changed(type("Event", (), {"data": "true", "control": row})())
+
+    async def run(self, iterations, templates):
+        for _ in range(iterations):
+            main_disease, sheet_name = self.rng.choice(templates)
+            patient_id = self.rng.choice(self.patient_ids)
+            await self.timed("search_patient", lambda: self.type_patient_id(patient_id))
+            await self.timed("open_create", lambda: self.click("新規作成"))
+            await self.timed("select_disease", lambda: self.select("主病名", main_disease))
+            await self.timed("apply_template", lambda: self.select("シート名", sheet_name))
+            await self.timed("create_and_print", lambda: self.click("新規発行"))
+            # 発行後の一覧はカルテIDの患者に戻るため、もう一度患者IDを入力して発行した計画書を開く
+            await self.timed("search_patient", lambda: self.type_patient_id(patient_id))
+            await self.timed("open_plan", self.select_latest_plan)
+            await self.timed("save_plan", lambda: self.click("保存"))
+            await self.timed("print_plan", lambda: self.click("印刷"))
+            await self.timed("back", lambda: self.click("戻る"))
+
+
+def prepare_environment(work_dir, patients, seed, max_plans):
+    # アプリを読み込む前に、DBと患者マスタのキャッシュを作業用ディレクトリに向ける
+    os.makedirs(work_dir, exist_ok=True)
+    db_path = os.path.join(work_dir, "load_test.db")
+    if os.path.exists(db_path):
+        os.remove(db_path)
+    os.environ["DATABASE_URL"] = f"sqlite:///{db_path}"
+    os.environ["PATIENT_CACHE_DIR"] = os.path.join(work_dir, "patient_cache")
+    csv_path = write_patient_csv(os.path.join(work_dir, "pat.csv"), patients, seed=seed)
+    from database import init_db
+    init_db()
+    if max_plans:
+        write_history_db(patients, seed=seed, max_plans_per_patient=max_plans)
+
+    from patient_master import build_patient_master, swap_patient_master
+    patient_master = build_patient_master(csv_path, cache_dir=os.environ["PATIENT_CACHE_DIR"])
+    swap_patient_master(patient_master)
+    return list(range(1, patients + 1))
+
+
+async def run_load_test(args):
+    patient_ids = prepare_environment(args.work_dir, args.patients, args.seed, args.max_plans)
+
+    import main as app
+    from pdf_service import get_pdf_executor
+    from template_manager import template_manager
+
+    # 検索の待ち時間は人の入力速度の模擬であり、処理時間の計測からは除く
+    app.PATIENT_ID_SEARCH_DELAY = 0
+    template_manager.load()
+    templates = list(template_manager.templates)
+    get_pdf_executor().submit(int).result()  # ワーカープロセスの起動を計測から除く
+
+    loop = asyncio.get_running_loop()
+    executor = ThreadPoolExecutor()
+
+    # セッションを開いた直後のメモリ使用量（Pythonのヒープ）をセッション数で割る
+    tracemalloc.start()
+    before = tracemalloc.take_snapshot()
+    clinicians = [SimulatedClinician(app, loop, executor, patient_ids, args.seed + n, args.think_time)
+                  for n in range(args.sessions)]
+    for clinician in clinicians:
+        await clinician.open()
+    after = tracemalloc.take_snapshot()
+    tracemalloc.stop()
+    session_bytes = sum(stat.size_diff for stat in after.compare_to(before, "filename")) / args.sessions
+
+    started = time.perf_counter()
+    await asyncio.gather(*(clinician.run(args.iterations, templates) for clinician in clinicians))
+    elapsed = time.perf_counter() - started
+
+    timings = defaultdict(list)
+    messages = defaultdict(list)
+    for clinician in clinicians:
+        for name, values in clinician.timings.items():
+            timings[name].extend(values)
+            messages[name].extend(clinician.messages[name])
+    # 実際に作成されてダウンロードを開始した（launch_url した）PDFだけを数える
+    pdfs = sum(len(clinician.page.launched_urls) for clinician in clinicians)
+    batches = sum(clinician.connection.batches for clinician in clinicians)
+    sent = sum(clinician.connection.bytes for clinician in clinicians)
+
+    print(f"セッション数 {args.sessions} / 繰り返し {args.iterations} / 患者 {args.patients}件 / {elapsed:.2f}秒")
+    print(f"{'操作':<18}{'件数':>6}{'p50(ms)':>10}{'p95(ms)':>10}{'p99(ms)':>10}{'送信回数':>8}")
+    for name, values in timings.items():
+        print(f"{name:<18}{len(values):>6}{percentile(values, 50) * 1000:>10.1f}"
+              f"{percentile(values, 95) * 1000:>10.1f}{percentile(values, 99) * 1000:>10.1f}"
+              f"{sum(messages[name]) / len(values):>8.1f}")
+    print(f"PDF {pdfs}件 {pdfs / elapsed:.1f}件/秒")
+    print(f"1セッションあたりのメモリ {session_bytes / 1024:.1f}KB / 最大RSS "
+          f"{resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024:.1f}MB")
+    print(f"画面への送信 {batches}回 {sent / 1024:.1f}KB")
+    executor.shutdown()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="複数の利用者が同時に操作した場合の負荷試験")
+    parser.add_argument("-s", "--sessions", type=int, default=10, help="同時に操作するセッション数")
+    parser.add_argument("-i", "--iterations", type=int, default=5, help="1セッションが操作を繰り返す回数")
+    parser.add_argument("-p", "--patients", type=int, default=1000, help="架空の患者マスタの件数")
+    parser.add_argument("--max-plans", type=int, default=0, help="事前に作成しておく1患者あたりの計画書の最大件数")
+    parser.add_argument("--seed", type=int, default=0, help="乱数の種（同じ値なら同じ操作を再現する）")
+    parser.add_argument("--think-time", type=float, default=0.0, help="操作の間の平均待ち時間（秒）")
+    parser.add_argument("--work-dir", default=os.path.join(tempfile.gettempdir(), "ldtp_load_test"),
+                        help="DBと患者マスタを作成するディレクトリ")
+    args = parser.parse_args()
+    asyncio.run(run_load_test(args))
+
+
+if __name__ == "__main__":
+    main()
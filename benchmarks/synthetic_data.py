@@ -0,0 +1,173 @@
+import argparse
+import os
+import sys
+import time
+from datetime import date, timedelta
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# pat.csv の1行の列数（アプリが読むのは patient_master.USE_COLUMNS の列だけ）
+PATIENT_CSV_COLUMNS = 32
+# 生成・書き出しを行う単位（1000万件でもメモリはこの件数分しか使わない）
+SYNTHETIC_CHUNK_SIZE = 500_000
+
+FAMILY_NAMES = [("佐藤", "ｻﾄｳ"), ("鈴木", "ｽｽﾞｷ"), ("高橋", "ﾀｶﾊｼ"), ("田中", "ﾀﾅｶ"), ("伊藤", "ｲﾄｳ"),
+                ("渡辺", "ﾜﾀﾅﾍﾞ"), ("山本", "ﾔﾏﾓﾄ"), ("中村", "ﾅｶﾑﾗ"), ("小林", "ｺﾊﾞﾔｼ"), ("加藤", "ｶﾄｳ"),
+                ("吉田", "ﾖｼﾀﾞ"), ("山田", "ﾔﾏﾀﾞ"), ("佐々木", "ｻｻｷ"), ("山口", "ﾔﾏｸﾞﾁ"), ("松本", "ﾏﾂﾓﾄ"),
+                ("井上", "ｲﾉｳｴ"), ("木村", "ｷﾑﾗ"), ("林", "ﾊﾔｼ"), ("斎藤", "ｻｲﾄｳ"), ("清水", "ｼﾐｽﾞ")]
+MALE_NAMES = [("太郎", "ﾀﾛｳ"), ("一郎", "ｲﾁﾛｳ"), ("健", "ｹﾝ"), ("誠", "ﾏｺﾄ"), ("大輔", "ﾀﾞｲｽｹ"),
+              ("翔太", "ｼｮｳﾀ"), ("浩", "ﾋﾛｼ"), ("隆", "ﾀｶｼ"), ("正雄", "ﾏｻｵ"), ("修", "ｵｻﾑ")]
+FEMALE_NAMES = [("花子", "ﾊﾅｺ"), ("恵子", "ｹｲｺ"), ("洋子", "ﾖｳｺ"), ("幸子", "ｻﾁｺ"), ("美咲", "ﾐｻｷ"),
+                ("陽子", "ﾖｳｺ"), ("直美", "ﾅｵﾐ"), ("裕子", "ﾕｳｺ"), ("由美", "ﾕﾐ"), ("和子", "ｶｽﾞｺ")]
+# 医師ID・医師名・診療科コード・診療科
+DOCTORS = [(101, "山本医師", 1, "内科"), (102, "中村医師", 1, "内科"), (103, "小林医師", 1, "内科"),
+           (201, "加藤医師", 2, "循環器内科"), (202, "吉田医師", 2, "循環器内科"), (301, "山田医師", 3, "糖尿病内科")]
+
+BIRTHDATE_START = date(1930, 1, 1)
+BIRTHDATE_DAYS = 365 * 75
+ISSUE_DATE_START = date(2024, 4, 1)
+ISSUE_DATE_DAYS = 365
+
+
+def _yyyymmdd(start, offsets):
+    days = pd.to_datetime(np.datetime64(start, "D") + offsets.astype("timedelta64[D]"))
+    return (days.year * 10000 + days.month * 100 + days.day).astype(str)
+
+
+def iter_patient_frames(rows, seed=0, first_patient_id=1, chunk_size=SYNTHETIC_CHUNK_SIZE):
+    # 本番の pat.csv と同じ列位置の DataFrame を chunk_size 件ずつ作る（同じ seed なら同じ内容になる）
+    rng = np.random.default_rng(seed)
+    family = np.array(FAMILY_NAMES)
+    given = {1: np.array(MALE_NAMES), 2: np.array(FEMALE_NAMES)}
+    doctors = np.array(DOCTORS, dtype=object)
+
+    for start in range(0, rows, chunk_size):
+        size = min(chunk_size, rows - start)
+        gender = rng.choice((1, 2), size=size)
+        family_index = rng.integers(len(family), size=size)
+        given_index = rng.integers(len(MALE_NAMES), size=size)
+        doctor = doctors[rng.integers(len(DOCTORS), size=size)]
+        given_names = np.where(gender == 1, given[1][given_index, 0], given[2][given_index, 0])
+        given_kana = np.where(gender == 1, given[1][given_index, 1], given[2][given_index, 1])
+
+        frame = pd.DataFrame({column: "" for column in range(PATIENT_CSV_COLUMNS)}, index=range(size))
+        frame[0] = _yyyymmdd(ISSUE_DATE_START, rng.integers(ISSUE_DATE_DAYS, size=size))
+        frame[2] = np.arange(first_patient_id + start, first_patient_id + start + size)
+        frame[3] = np.char.add(family[family_index, 0], given_names)
+        frame[4] = np.char.add(family[family_index, 1], given_kana)
+        frame[5] = gender
+        frame[6] = _yyyymmdd(BIRTHDATE_START, rng.integers(BIRTHDATE_DAYS, size=size))
+        frame[9] = doctor[:, 0]
+        frame[10] = doctor[:, 1]
+        frame[11] = doctor[:, 0]
+        frame[12] = doctor[:, 1]
+        frame[13] = doctor[:, 2]
+        frame[14] = doctor[:, 3]
+        frame[20] = 1
+        frame[27] = 1
+        frame[31] = 24
+        yield frame
+
+
+def write_patient_csv(path, rows, seed=0, first_patient_id=1, chunk_size=SYNTHETIC_CHUNK_SIZE):
+    # 架空の患者を Shift-JIS・YYYYMMDD形式で書き出す
+    with open(path, "w", encoding="shift_jis", newline="") as f:
+        for frame in iter_patient_frames(rows, seed, first_patient_id, chunk_size):
+            frame.to_csv(f, header=False, index=False)
+    return path
+
+
+def iter_history_rows(rows, seed=0, max_plans_per_patient=3, first_patient_id=1, chunk_size=SYNTHETIC_CHUNK_SIZE):
+    # pat.csv と同じ患者について、テンプレートから作った計画書の履歴を作る
+    from template_manager import template_manager
+
+    template_manager.load()
+    templates = sorted(template_manager.templates.items())
+    rng = np.random.default_rng(seed + 1)
+    for frame in iter_patient_frames(rows, seed, first_patient_id, chunk_size):
+        plan_counts = rng.integers(max_plans_per_patient + 1, size=len(frame))
+        for patient, plan_count in zip(frame.itertuples(index=False), plan_counts):
+            if not plan_count:
+                continue
+            (main_disease, sheet_name), template = templates[rng.integers(len(templates))]
+            birthdate = date(int(patient[6][:4]), int(patient[6][4:6]), int(patient[6][6:]))
+            first_issue_date = ISSUE_DATE_START - timedelta(days=int(rng.integers(ISSUE_DATE_DAYS * 2)))
+            for count in range(1, plan_count + 1):
+                yield {
+                    "patient_id": int(patient[2]),
+                    "patient_name": patient[3],
+                    "kana": patient[4],
+                    "gender": "男性" if patient[5] == 1 else "女性",
+                    "birthdate": birthdate,
+                    "issue_date": first_issue_date + timedelta(days=90 * (count - 1)),
+                    "doctor_id": int(patient[9]),
+                    "doctor_name": patient[10],
+                    "department": patient[14],
+                    "main_diagnosis": main_disease,
+                    "sheet_name": sheet_name,
+                    "creation_count": count,
+                    "target_weight": round(float(rng.uniform(45, 90)), 1),
+                    "goal1": template["goal1"],
+                    "goal2": template["goal2"],
+                    "diet": template["diet"],
+                    "exercise_prescription": template["exercise_prescription"],
+                    "exercise_time": template["exercise_time"],
+                    "exercise_frequency": template["exercise_frequency"],
+                    "exercise_intensity": template["exercise_intensity"],
+                    "daily_activity": template["daily_activity"],
+                    "nonsmoker": str(bool(template["nonsmoker"])),
+                    "smoking_cessation": "False",
+                    "other1": template["other1"],
+                    "other2": template["other2"],
+                }
+
+
+def write_history_db(rows, seed=0, max_plans_per_patient=3, first_patient_id=1, batch_size=10_000):
+    # DATABASE_URL のDBに計画書の履歴をまとめて挿入する（executemany で batch_size 件ずつ）
+    from sqlalchemy import insert
+
+    from database import engine, init_db
+    from models import PatientInfo
+
+    init_db()
+    total = 0
+    batch = []
+    with engine.begin() as connection:
+        for plan in iter_history_rows(rows, seed, max_plans_per_patient, first_patient_id):
+            batch.append(plan)
+            if len(batch) == batch_size:
+                connection.execute(insert(PatientInfo), batch)
+                total += len(batch)
+                batch = []
+        if batch:
+            connection.execute(insert(PatientInfo), batch)
+            total += len(batch)
+    return total
+
+
+def main():
+    parser = argparse.ArgumentParser(description="ベンチマーク用の架空の患者マスタ（pat.csv）と計画書履歴DBを作成する")
+    parser.add_argument("-n", "--rows", type=int, default=1000, help="患者数（1000〜10000000程度）")
+    parser.add_argument("-o", "--output", default="synthetic_pat.csv", help="患者マスタの出力先")
+    parser.add_argument("--seed", type=int, default=0, help="乱数の種（同じ値なら同じ内容を作る）")
+    parser.add_argument("--database-url", help="計画書履歴を作成するDB（省略時は履歴を作らない）")
+    parser.add_argument("--max-plans", type=int, default=3, help="1患者あたりの計画書の最大件数")
+    args = parser.parse_args()
+
+    started = time.perf_counter()
+    write_patient_csv(args.output, args.rows, seed=args.seed)
+    print(f"患者マスタを作成しました: {args.output} {args.rows}件 {time.perf_counter() - started:.1f}秒")
+
+    if args.database_url:
+        # database を読み込む前に接続先を切り替える
+        os.environ["DATABASE_URL"] = args.database_url
+        started = time.perf_counter()
+        total = write_history_db(args.rows, seed=args.seed, max_plans_per_patient=args.max_plans)
+        print(f"計画書履歴を作成しました: {args.database_url} {total}件 {time.perf_counter() - started:.1f}秒")
+
+
+if __name__ == "__main__":
+    main()
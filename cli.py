@@ -0,0 +1,144 @@
+import argparse
+import os
+import sys
+import time
+from datetime import datetime
+
+from batch_print import BATCH_CHUNK_SIZE, MERGED_PDF_MAX_PLANS, batch_print
+from database import init_db
+from plan_export import EXPORT_CHUNK_SIZE, export_plans
+from plan_import import IMPORT_BATCH_SIZE, import_plans
+from plan_service import create_plan, render_plan
+from pdf_service import create_pdf
+
+
+def parse_date(value):
+    return datetime.strptime(value, "%Y-%m-%d").date()
+
+
+def _write_pdf(output, pdf_data):
+    with open(output, "wb") as f:
+        f.write(pdf_data)
+    print(f"{output} に出力しました")
+
+
+def command_create(args):
+    plan = create_plan(args.patient_id, args.main_disease, args.sheet_name, args.doctor_id, args.doctor_name,
+                       args.department, args.creation_count, args.target_weight)
+    print(f"計画書を作成しました: ID {plan.id}")
+    if args.output:
+        _write_pdf(args.output, create_pdf(plan))
+
+
+def command_render(args):
+    patient_info, pdf_data = render_plan(args.plan_id)
+    _write_pdf(args.output or f"計画書_{patient_info.patient_name}_{patient_info.id}.pdf", pdf_data)
+
+
+def command_batch(args):
+    output_format = "zip" if os.path.splitext(args.output)[1].lower() == ".zip" else "pdf"
+
+    def show_progress(done, total):
+        print(f"\r{done}/{total}件", end="", file=sys.stderr, flush=True)
+
+    started = time.perf_counter()
+    count = batch_print(args.output, args.start_date, args.end_date, args.doctor_id, args.department,
+                        output_format, args.chunk_size, show_progress)
+    elapsed = time.perf_counter() - started
+    print(f"\n{count}件を {args.output} に出力しました（{elapsed:.1f}秒）")
+
+
+def command_import(args):
+    def show_progress(rows_done, imported, elapsed):
+        rate = imported / elapsed if elapsed else 0
+        print(f"\r{rows_done}行 {imported}件 {rate:.0f}件/秒", end="", file=sys.stderr, flush=True)
+
+    result = import_plans(args.source, args.layout, args.encoding, args.batch_size, args.restart, show_progress)
+    print(f"\n{result.imported}件を取り込みました（{result.elapsed:.1f}秒 {result.rows_per_second:.0f}件/秒）")
+    if result.skipped:
+        print(f"前回までに処理済みの {result.skipped}行を読み飛ばしました")
+    if result.rejected:
+        print(f"{result.rejected}行は不正な値のため取り込みませんでした", file=sys.stderr)
+        for row_number, message in result.errors[:20]:
+            print(f"  {row_number}行目: {message}", file=sys.stderr)
+
+
+def command_export(args):
+    output_format = "zip" if os.path.splitext(args.output)[1].lower() == ".zip" else "xlsx"
+
+    def show_progress(done, total):
+        print(f"\r{done}/{total}件", end="", file=sys.stderr, flush=True)
+
+    started = time.perf_counter()
+    count = export_plans(args.output, args.start_date, args.end_date, args.doctor_id, args.department, args.layout,
+                         output_format, args.chunk_size, show_progress)
+    elapsed = time.perf_counter() - started
+    print(f"\n{count}件を {args.output} に出力しました（{elapsed:.1f}秒）")
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(description="生活習慣病療養計画書（画面なしで実行）")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    create = subparsers.add_parser("create", help="患者IDとテンプレートから計画書を作成する")
+    create.add_argument("patient_id", type=int, help="患者ID")
+    create.add_argument("main_disease", help="主病名")
+    create.add_argument("sheet_name", help="シート名")
+    create.add_argument("--doctor-id", type=int, help="医師ID（省略時は患者マスタの値）")
+    create.add_argument("--doctor-name", help="医師名（省略時は患者マスタの値）")
+    create.add_argument("--department", help="診療科（省略時は患者マスタの値）")
+    create.add_argument("--creation-count", type=int, default=1, help="作成回数")
+    create.add_argument("--target-weight", type=float, help="目標体重")
+    create.add_argument("-o", "--output", help="作成した計画書のPDFの出力先")
+    create.set_defaults(func=command_create)
+
+    render = subparsers.add_parser("render", help="保存済みの計画書をPDFに出力する")
+    render.add_argument("plan_id", type=int, help="計画書ID")
+    render.add_argument("-o", "--output", help="PDFの出力先")
+    render.set_defaults(func=command_render)
+
+    batch = subparsers.add_parser("batch", help="条件に合う計画書をまとめて出力する")
+    batch.add_argument("output", help="出力先のファイル（.zip: 1件1ファイル / .pdf: 1つにまとめる、"
+                                      f"{MERGED_PDF_MAX_PLANS}件まで）")
+    batch.add_argument("--from", dest="start_date", type=parse_date, help="発行日の開始日（YYYY-MM-DD）")
+    batch.add_argument("--to", dest="end_date", type=parse_date, help="発行日の終了日（YYYY-MM-DD）")
+    batch.add_argument("--doctor-id", type=int, help="医師ID")
+    batch.add_argument("--department", help="診療科")
+    batch.add_argument("--chunk-size", type=int, default=BATCH_CHUNK_SIZE, help="ワーカー1回あたりの件数")
+    batch.set_defaults(func=command_batch)
+
+    import_ = subparsers.add_parser("import", help="CSV/Excel の計画書の履歴をまとめて取り込む")
+    import_.add_argument("source", help="取り込むファイル（.csv または .xlsx）")
+    import_.add_argument("--layout", choices=["rows", "sheet"], default="rows",
+                         help="rows: 1行目が列名の表形式 / sheet: 1シート1件の共通シート形式（B2〜B26）")
+    import_.add_argument("--encoding", default="utf-8-sig", help="CSVの文字コード（例: shift_jis）")
+    import_.add_argument("--batch-size", type=int, default=IMPORT_BATCH_SIZE, help="1トランザクションの件数")
+    import_.add_argument("--restart", action="store_true", help="前回の進み具合を無視して最初から取り込む")
+    import_.set_defaults(func=command_import)
+
+    export = subparsers.add_parser("export", help="条件に合う計画書を Excel にまとめて書き出す")
+    export.add_argument("output", help="出力先のファイル（.xlsx、または .zip で1000件ずつのExcelに分ける）")
+    export.add_argument("--from", dest="start_date", type=parse_date, help="発行日の開始日（YYYY-MM-DD）")
+    export.add_argument("--to", dest="end_date", type=parse_date, help="発行日の終了日（YYYY-MM-DD）")
+    export.add_argument("--doctor-id", type=int, help="医師ID")
+    export.add_argument("--department", help="診療科")
+    export.add_argument("--layout", choices=["rows", "sheet"], default="rows",
+                        help="rows: 1行1件の表形式 / sheet: 1シート1件の共通シート形式（B2〜B26）")
+    export.add_argument("--chunk-size", type=int, default=EXPORT_CHUNK_SIZE, help="DBから1回に読み込む件数")
+    export.set_defaults(func=command_export)
+    return parser
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    init_db()
+    try:
+        args.func(args)
+    except ValueError as e:
+        print(e, file=sys.stderr)
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
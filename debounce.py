@@ -0,0 +1,35 @@
+import threading
+
+
+class Debouncer:
+    # 呼び出しが delay 秒途切れた時点で最後の引数だけを使って func を実行する。
+    # func には最後の引数に加えて is_latest を渡し、実行中に新しい入力があれば結果を捨てられるようにする。
+    def __init__(self, delay, func):
+        self.delay = delay
+        self.func = func
+        self._lock = threading.Lock()
+        self._timer = None
+        self._generation = 0
+
+    def __call__(self, *args):
+        with self._lock:
+            self._generation += 1
+            if self._timer is not None:
+                self._timer.cancel()
+            self._timer = threading.Timer(self.delay, self._run, args=(self._generation, args))
+            self._timer.daemon = True
+            self._timer.start()
+
+    def _run(self, generation, args):
+        def is_latest():
+            return generation == self._generation
+
+        if is_latest():
+            self.func(*args, is_latest)
+
+    def cancel(self):
+        with self._lock:
+            self._generation += 1
+            if self._timer is not None:
+                self._timer.cancel()
+                self._timer = None
@@ -0,0 +1,168 @@
+import asyncio
+import functools
+import json
+import os
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+
+# 0 以下なら定期的なログ出力を行わない
+METRICS_LOG_INTERVAL = float(os.environ.get("METRICS_LOG_INTERVAL", 0))
+
+# 処理時間（秒）のヒストグラムの区切り
+DEFAULT_BUCKETS = (0.0001, 0.0005, 0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+class Counter:
+    def __init__(self, name, help_text):
+        self.name = name
+        self.help_text = help_text
+        self.value = 0
+        self._lock = threading.Lock()
+
+    def inc(self, amount=1):
+        with self._lock:
+            self.value += amount
+
+    def exposition(self):
+        return [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} counter", f"{self.name} {self.value}"]
+
+    def summary(self):
+        return self.value
+
+
+class Histogram:
+    def __init__(self, name, help_text, buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.help_text = help_text
+        self.buckets = tuple(buckets)
+        self.bucket_counts = [0] * (len(self.buckets) + 1)
+        self.count = 0
+        self.sum = 0.0
+        self.max = 0.0
+        self._lock = threading.Lock()
+
+    def observe(self, value):
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            self.bucket_counts[index] += 1
+            self.count += 1
+            self.sum += value
+            if value > self.max:
+                self.max = value
+
+    def exposition(self):
+        with self._lock:
+            bucket_counts = list(self.bucket_counts)
+            count, total = self.count, self.sum
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} histogram"]
+        cumulative = 0
+        for bound, bucket_count in zip(self.buckets, bucket_counts):
+            cumulative += bucket_count
+            lines.append(f'{self.name}_bucket{{le="{bound}"}} {cumulative}')
+        lines.append(f'{self.name}_bucket{{le="+Inf"}} {count}')
+        lines.append(f"{self.name}_sum {total}")
+        lines.append(f"{self.name}_count {count}")
+        return lines
+
+    def summary(self):
+        with self._lock:
+            if not self.count:
+                return {"count": 0}
+            return {"count": self.count, "avg": round(self.sum / self.count, 6), "max": round(self.max, 6)}
+
+
+# プロセス内で共有する計測値（名前ごとに1つ）
+_metrics = {}
+_metrics_lock = threading.Lock()
+
+
+def _get_or_create(cls, name, help_text, *args):
+    metric = _metrics.get(name)
+    if metric is None:
+        with _metrics_lock:
+            metric = _metrics.get(name)
+            if metric is None:
+                metric = _metrics[name] = cls(name, help_text, *args)
+    return metric
+
+
+def counter(name, help_text=""):
+    return _get_or_create(Counter, name, help_text)
+
+
+def histogram(name, help_text="", buckets=DEFAULT_BUCKETS):
+    return _get_or_create(Histogram, name, help_text, buckets)
+
+
+@contextmanager
+def timer(name, help_text=""):
+    metric = histogram(name, help_text)
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        metric.observe(time.perf_counter() - started)
+
+
+def timed(name, help_text=""):
+    # 関数（コルーチン関数も可）の実行時間を name のヒストグラムに記録するデコレータ
+    def decorator(func):
+        metric = histogram(name, help_text)
+
+        if asyncio.iscoroutinefunction(func):
+            @functools.wraps(func)
+            async def async_wrapper(*args, **kwargs):
+                started = time.perf_counter()
+                try:
+                    return await func(*args, **kwargs)
+                finally:
+                    metric.observe(time.perf_counter() - started)
+            return async_wrapper
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            started = time.perf_counter()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                metric.observe(time.perf_counter() - started)
+        return wrapper
+
+    return decorator
+
+
+def render_prometheus():
+    # Prometheus のテキスト形式で全ての計測値を返す
+    lines = []
+    for name in sorted(_metrics):
+        lines.extend(_metrics[name].exposition())
+    return "\n".join(lines) + "\n"
+
+
+def metrics_summary():
+    return {name: _metrics[name].summary() for name in sorted(_metrics)}
+
+
+class MetricsLogger(threading.Thread):
+    # 計測値の要約を interval 秒ごとに1行のJSONで出力する
+    def __init__(self, interval=METRICS_LOG_INTERVAL):
+        super().__init__(name="metrics-logger", daemon=True)
+        self.interval = interval
+        self._stop_event = threading.Event()
+
+    def run(self):
+        while not self._stop_event.wait(self.interval):
+            print(json.dumps({"metrics": metrics_summary()}, ensure_ascii=False))
+
+    def stop(self):
+        self._stop_event.set()
+
+
+def start_metrics_logger(interval=METRICS_LOG_INTERVAL):
+    if interval <= 0:
+        return None
+    metrics_logger = MetricsLogger(interval)
+    metrics_logger.start()
+    return metrics_logger
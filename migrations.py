@@ -0,0 +1,76 @@
+from datetime import datetime
+
+from sqlalchemy import Column, DateTime, Integer, MetaData, String, Table, func, insert, select, text
+from sqlalchemy.exc import IntegrityError
+
+# 適用済みのマイグレーションを記録するテーブル
+metadata = MetaData()
+schema_version = Table(
+    "schema_version",
+    metadata,
+    Column("version", Integer, primary_key=True),
+    Column("description", String),
+    Column("applied_at", DateTime),
+)
+
+
+def _create_index(connection, name, table, columns):
+    column_list = ", ".join(columns)
+    connection.execute(text(f"CREATE INDEX IF NOT EXISTS {name} ON {table} ({column_list})"))
+
+
+def _create_unique_index(connection, name, table, columns):
+    # 既存データに重複があると一意インデックスを作れないため、データは残したまま別名の通常のインデックスを作り、
+    # False を返す（マイグレーションは適用済みにせず、重複が解消された後の起動で一意インデックスに作り直す）
+    column_list = ", ".join(columns)
+    fallback_name = "ix_" + name.removeprefix("ux_")
+    duplicate = connection.execute(
+        text(f"SELECT {column_list} FROM {table} GROUP BY {column_list} HAVING COUNT(*) > 1")
+    ).first()
+    if duplicate is not None:
+        print(f"{table} に重複データがあるため {name} を作成できません（{fallback_name} で代用します）:",
+              tuple(duplicate))
+        _create_index(connection, fallback_name, table, columns)
+        return False
+    connection.execute(text(f"CREATE UNIQUE INDEX IF NOT EXISTS {name} ON {table} ({column_list})"))
+    connection.execute(text(f"DROP INDEX IF EXISTS {fallback_name}"))
+    return True
+
+
+def _add_lookup_indexes(connection):
+    _create_index(connection, "ix_patient_info_patient_id_id", "patient_info", ["patient_id", "id"])
+    _create_index(connection, "ix_sheet_names_main_disease_id", "sheet_names", ["main_disease_id"])
+    main_diseases_unique = _create_unique_index(connection, "ux_main_diseases_name", "main_diseases", ["name"])
+    templates_unique = _create_unique_index(connection, "ux_templates_main_disease_sheet_name", "templates",
+                                            ["main_disease", "sheet_name"])
+    return main_diseases_unique and templates_unique
+
+
+# (バージョン, 説明, 適用する関数) の順に追加していく
+MIGRATIONS = [
+    (1, "履歴・テンプレート・主病名の検索用インデックスを追加", _add_lookup_indexes),
+]
+
+
+def run_migrations(engine):
+    metadata.create_all(engine)
+    with engine.connect() as connection:
+        current_version = connection.execute(select(func.max(schema_version.c.version))).scalar() or 0
+
+    for version, description, migrate in MIGRATIONS:
+        if version <= current_version:
+            continue
+        try:
+            with engine.begin() as connection:
+                # False を返したマイグレーションは途中までの変更だけ残し、次回の起動で再度適用する
+                completed = migrate(connection) is not False
+                if completed:
+                    connection.execute(insert(schema_version).values(
+                        version=version, description=description, applied_at=datetime.now()))
+        except IntegrityError:
+            # 別プロセスが同じマイグレーションを先に適用した
+            continue
+        if not completed:
+            print(f"マイグレーション {version} は完了していません（以降のマイグレーションも保留します）: {description}")
+            return
+        print(f"マイグレーション {version} を適用しました: {description}")
@@ -0,0 +1,99 @@
+from sqlalchemy import Column, Integer, String, Float, Date, DateTime, Boolean, Index
+from sqlalchemy.orm import declarative_base
+
+Base = declarative_base()
+
+
+# PatientInfoモデルの定義
+class PatientInfo(Base):
+    __tablename__ = 'patient_info'
+    id = Column(Integer, primary_key=True)
+    patient_id = Column(Integer)
+    patient_name = Column(String)
+    kana = Column(String)
+    gender = Column(String)
+    birthdate = Column(Date)
+    issue_date = Column(Date)
+    doctor_id = Column(Integer)
+    doctor_name = Column(String)
+    department = Column(String)
+    main_diagnosis = Column(String)
+    creation_count = Column(Integer)
+    target_weight = Column(Float)
+    sheet_name = Column(String)
+    goal1 = Column(String)
+    goal2 = Column(String)
+    diet = Column(String)
+    exercise_prescription = Column(String)
+    exercise_time = Column(String)
+    exercise_frequency = Column(String)
+    exercise_intensity = Column(String)
+    daily_activity = Column(String)
+    nonsmoker = Column(String)
+    smoking_cessation = Column(String)
+    other1 = Column(String)
+    other2 = Column(String)
+    template = Column(String)
+
+    __table_args__ = (
+        Index("ix_patient_info_patient_id_id", "patient_id", "id"),
+    )
+
+
+class MainDisease(Base):
+    __tablename__ = "main_diseases"
+    id = Column(Integer, primary_key=True)
+    name = Column(String)
+
+    __table_args__ = (
+        Index("ux_main_diseases_name", "name", unique=True),
+    )
+
+
+class SheetName(Base):
+    __tablename__ = "sheet_names"
+    id = Column(Integer, primary_key=True)
+    main_disease_id = Column(Integer)
+    name = Column(String)
+
+    __table_args__ = (
+        Index("ix_sheet_names_main_disease_id", "main_disease_id"),
+    )
+
+
+class Template(Base):
+    __tablename__ = 'templates'
+    id = Column(Integer, primary_key=True)
+    main_disease = Column(String)
+    sheet_name = Column(String)
+    goal1 = Column(String)
+    goal2 = Column(String)
+    diet = Column(String)
+    exercise_prescription = Column(String)
+    exercise_time = Column(String)
+    exercise_frequency = Column(String)
+    exercise_intensity = Column(String)
+    daily_activity = Column(String)
+    nonsmoker = Column(Boolean)
+    other1 = Column(String)
+    other2 = Column(String)
+
+    __table_args__ = (
+        Index("ux_templates_main_disease_sheet_name", "main_disease", "sheet_name", unique=True),
+    )
+
+
+# 計画書の一括取り込みの進み具合（取り込みと同じトランザクションで更新し、中断した位置から再開する）
+class ImportProgress(Base):
+    __tablename__ = "import_progress"
+    id = Column(Integer, primary_key=True)
+    source_digest = Column(String)
+    source_name = Column(String)
+    rows_done = Column(Integer, default=0)
+    rows_imported = Column(Integer, default=0)
+    completed = Column(Boolean, default=False)
+    updated_at = Column(DateTime)
+
+    __table_args__ = (
+        Index("ux_import_progress_source_digest", "source_digest", unique=True),
+    )
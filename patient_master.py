@@ -0,0 +1,311 @@
+import hashlib
+import os
+import shutil
+import tempfile
+import threading
+import time
+from datetime import date
+from typing import NamedTuple, Optional
+
+import numpy as np
+import pandas as pd
+
+from metrics import histogram, timed
+
+PATIENT_CSV_PATH = "pat.csv"
+PATIENT_CSV_CHUNK_SIZE = 100_000
+PATIENT_CACHE_DIR = os.environ.get("PATIENT_CACHE_DIR", ".patient_cache")
+
+# pat.csv の列位置
+COL_ISSUE_DATE = 0
+COL_PATIENT_ID = 2
+COL_NAME = 3
+COL_KANA = 4
+COL_GENDER = 5
+COL_BIRTHDATE = 6
+COL_DOCTOR_ID = 9
+COL_DOCTOR_NAME = 10
+COL_DEPARTMENT = 14
+
+# アプリで使う列だけを型を指定して読み込む（日付は文字列で読んでから YYYYMMDD として変換する）
+DATE_COLUMNS = [COL_ISSUE_DATE, COL_BIRTHDATE]
+COLUMN_DTYPES = {
+    COL_ISSUE_DATE: str,
+    COL_PATIENT_ID: "Int64",
+    COL_NAME: str,
+    COL_KANA: str,
+    COL_GENDER: "Int64",
+    COL_BIRTHDATE: str,
+    COL_DOCTOR_ID: "Int64",
+    COL_DOCTOR_NAME: str,
+    COL_DEPARTMENT: str,
+}
+USE_COLUMNS = sorted(COLUMN_DTYPES)
+
+
+class PatientRecord(NamedTuple):
+    patient_id: int
+    issue_date: Optional[date]
+    name: str
+    kana: str
+    gender: str
+    birthdate: Optional[date]
+    doctor_id: Optional[int]
+    doctor_name: str
+    department: str
+
+
+def iter_patient_chunks(path=PATIENT_CSV_PATH, chunksize=PATIENT_CSV_CHUNK_SIZE):
+    reader = pd.read_csv(path, encoding="shift_jis", header=None, usecols=USE_COLUMNS, dtype=COLUMN_DTYPES,
+                         chunksize=chunksize)
+    with reader:
+        for chunk in reader:
+            for column in DATE_COLUMNS:
+                chunk[column] = pd.to_datetime(chunk[column], format="%Y%m%d", errors="coerce")
+            yield chunk
+
+
+def file_digest(path, chunk_size=1024 * 1024):
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def _file_stat(path):
+    try:
+        stat = os.stat(path)
+    except FileNotFoundError:
+        return None
+    return stat.st_mtime_ns, stat.st_size
+
+
+# 患者マスタの列（キャッシュのファイル名にも使う）
+MASTER_COLUMNS = ["patient_id", "issue_date", "name", "kana", "gender", "birthdate", "doctor_id", "doctor_name",
+                  "department"]
+MISSING_DOCTOR_ID = -1
+# 患者IDの検索用の配列（患者IDの昇順に並べたIDと、その行番号）。列と一緒にキャッシュに保存する
+INDEX_ARRAYS = ["sorted_patient_id", "sorted_row"]
+
+
+def _chunk_to_columns(df):
+    df = df[df[COL_PATIENT_ID].notna()]
+    return {
+        "patient_id": df[COL_PATIENT_ID].to_numpy(dtype="int64"),
+        "issue_date": df[COL_ISSUE_DATE].to_numpy(dtype="datetime64[D]"),
+        "name": df[COL_NAME].fillna("").to_numpy(dtype=str),
+        "kana": df[COL_KANA].fillna("").to_numpy(dtype=str),
+        "gender": df[COL_GENDER].fillna(0).to_numpy(dtype="int8"),
+        "birthdate": df[COL_BIRTHDATE].to_numpy(dtype="datetime64[D]"),
+        "doctor_id": df[COL_DOCTOR_ID].fillna(MISSING_DOCTOR_ID).to_numpy(dtype="int64"),
+        "doctor_name": df[COL_DOCTOR_NAME].fillna("").to_numpy(dtype=str),
+        "department": df[COL_DEPARTMENT].fillna("").to_numpy(dtype=str),
+    }
+
+
+def _to_date(value):
+    # NaT は None になる
+    return value.astype("datetime64[D]").astype(object)
+
+
+class PatientMaster:
+    # 患者IDをキーにした列指向の患者マスタ（同一IDが複数行ある場合は先頭行を採用）
+    def __init__(self, columns=None, source_digest=None, index=None):
+        if columns is None:
+            columns = _chunk_to_columns(pd.DataFrame(columns=USE_COLUMNS))
+        if index is None:
+            sorted_row = np.argsort(columns["patient_id"], kind="stable")
+            index = {"sorted_patient_id": columns["patient_id"][sorted_row], "sorted_row": sorted_row}
+        self.source_digest = source_digest
+        self._columns = columns
+        # Python の辞書を作らず、メモリマップした配列を二分探索する（件数が増えてもヒープを使わない）
+        self._index = index
+
+    def _find_row(self, patient_id):
+        try:
+            patient_id = int(patient_id)
+        except (TypeError, ValueError):
+            return None
+        sorted_patient_id = self._index["sorted_patient_id"]
+        position = int(np.searchsorted(sorted_patient_id, patient_id))
+        if position == len(sorted_patient_id) or sorted_patient_id[position] != patient_id:
+            return None
+        return int(self._index["sorted_row"][position])
+
+    @classmethod
+    def from_chunks(cls, chunks, source_digest=None):
+        parts = [_chunk_to_columns(chunk) for chunk in chunks]
+        if not parts:
+            return cls(source_digest=source_digest)
+        columns = {name: np.concatenate([part[name] for part in parts]) for name in MASTER_COLUMNS}
+        _, first_rows = np.unique(columns["patient_id"], return_index=True)
+        if len(first_rows) < len(columns["patient_id"]):
+            first_rows.sort()
+            columns = {name: values[first_rows] for name, values in columns.items()}
+        return cls(columns, source_digest=source_digest)
+
+    @timed("patient_lookup_seconds", "患者マスタの患者ID検索の所要時間")
+    def get(self, patient_id):
+        row = self._find_row(patient_id)
+        if row is None:
+            return None
+        columns = self._columns
+        doctor_id = int(columns["doctor_id"][row])
+        return PatientRecord(
+            patient_id=int(columns["patient_id"][row]),
+            issue_date=_to_date(columns["issue_date"][row]),
+            name=str(columns["name"][row]),
+            kana=str(columns["kana"][row]),
+            gender="男性" if columns["gender"][row] == 1 else "女性",
+            birthdate=_to_date(columns["birthdate"][row]),
+            doctor_id=None if doctor_id == MISSING_DOCTOR_ID else doctor_id,
+            doctor_name=str(columns["doctor_name"][row]),
+            department=str(columns["department"][row]),
+        )
+
+    def __contains__(self, patient_id):
+        return self._find_row(patient_id) is not None
+
+    def __len__(self):
+        return len(self._columns["patient_id"])
+
+    @property
+    def first_patient_id(self):
+        if not len(self):
+            return None
+        return int(self._columns["patient_id"][0])
+
+    def save_cache(self, cache_dir=PATIENT_CACHE_DIR):
+        # 一時ディレクトリに列ごとの .npy を書き出してから置き換え、古いキャッシュは削除する
+        if self.source_digest is None:
+            return None
+        target = os.path.join(cache_dir, self.source_digest)
+        if os.path.isdir(target):
+            return target
+        os.makedirs(cache_dir, exist_ok=True)
+        tmp_dir = tempfile.mkdtemp(dir=cache_dir, prefix=".tmp-")
+        try:
+            for name in MASTER_COLUMNS:
+                np.save(os.path.join(tmp_dir, f"{name}.npy"), self._columns[name], allow_pickle=False)
+            for name in INDEX_ARRAYS:
+                np.save(os.path.join(tmp_dir, f"{name}.npy"), self._index[name], allow_pickle=False)
+            os.replace(tmp_dir, target)
+        except OSError:
+            shutil.rmtree(tmp_dir, ignore_errors=True)
+            if not os.path.isdir(target):
+                raise
+        for entry in os.listdir(cache_dir):
+            if entry != self.source_digest:
+                shutil.rmtree(os.path.join(cache_dir, entry), ignore_errors=True)
+        return target
+
+    @classmethod
+    def load_cache(cls, source_digest, cache_dir=PATIENT_CACHE_DIR):
+        # メモリマップで読み込むため、列データはコピーされずページ単位で必要な分だけ読まれる
+        target = os.path.join(cache_dir, source_digest)
+        if not os.path.isdir(target):
+            return None
+        try:
+            columns = {name: np.load(os.path.join(target, f"{name}.npy"), mmap_mode="r", allow_pickle=False)
+                       for name in MASTER_COLUMNS}
+            index = {name: np.load(os.path.join(target, f"{name}.npy"), mmap_mode="r", allow_pickle=False)
+                     for name in INDEX_ARRAYS}
+        except (OSError, ValueError):
+            # 検索用の配列がない古い形式のキャッシュも作り直す
+            shutil.rmtree(target, ignore_errors=True)
+            return None
+        return cls(columns, source_digest=source_digest, index=index)
+
+
+# プロセス内で共有する読み取り専用の患者マスタ
+_shared_patient_master = None
+_shared_patient_master_lock = threading.Lock()
+
+
+def build_patient_master(path=PATIENT_CSV_PATH, digest=None, cache_dir=PATIENT_CACHE_DIR):
+    # 同じ内容のCSVを解析済みであればキャッシュから読み込む
+    if digest is None:
+        digest = file_digest(path)
+    started = time.perf_counter()
+    patient_master = PatientMaster.load_cache(digest, cache_dir)
+    if patient_master is not None:
+        elapsed = time.perf_counter() - started
+        histogram("patient_master_cache_load_seconds", "患者マスタのキャッシュ読込の所要時間").observe(elapsed)
+        print(f"患者マスタをキャッシュから読み込みました: {len(patient_master)}件 {elapsed:.3f}秒")
+        return patient_master
+
+    # チャンク単位で読み込むため、解析中のメモリはチャンクサイズ分しか増えない
+    patient_master = PatientMaster.from_chunks(iter_patient_chunks(path), source_digest=digest)
+    elapsed = time.perf_counter() - started
+    histogram("patient_csv_load_seconds", "pat.csv の読込・解析の所要時間").observe(elapsed)
+    print(f"患者マスタを読み込みました: {path} {len(patient_master)}件 {elapsed:.3f}秒")
+    try:
+        patient_master.save_cache(cache_dir)
+    except OSError as e:
+        print("患者マスタのキャッシュを保存できませんでした:", e)
+    return patient_master
+
+
+def get_patient_master():
+    global _shared_patient_master
+    if _shared_patient_master is None:
+        with _shared_patient_master_lock:
+            if _shared_patient_master is None:
+                _shared_patient_master = build_patient_master()
+    return _shared_patient_master
+
+
+def swap_patient_master(patient_master):
+    # 参照の差し替えだけで切り替えるため、閲覧中のセッションは旧マスタを読み終えてから新マスタを参照する
+    global _shared_patient_master
+    with _shared_patient_master_lock:
+        _shared_patient_master = patient_master
+
+
+class PatientMasterWatcher(threading.Thread):
+    # pat.csv の更新を監視し、内容が変わった場合だけ別スレッドで読み込み直して差し替える
+    def __init__(self, path=PATIENT_CSV_PATH, interval=60.0):
+        super().__init__(name="patient-master-watcher", daemon=True)
+        self.path = path
+        self.interval = interval
+        self._stop_event = threading.Event()
+        self._last_stat = _file_stat(path)
+        # 前回の確認で変更を見つけたときの状態（次の確認でも同じなら書き込みが終わったとみなす）
+        self._pending_stat = None
+
+    def run(self):
+        while not self._stop_event.wait(self.interval):
+            try:
+                self.check()
+            except Exception as e:
+                print("患者マスタの再読込に失敗しました:", e)
+
+    def check(self):
+        stat = _file_stat(self.path)
+        if stat is None or stat == self._last_stat:
+            self._pending_stat = None
+            return False
+        # 電子カルテが書き込み中の途中のファイルを読まないよう、2回続けて同じ状態になるまで待つ
+        if stat != self._pending_stat:
+            self._pending_stat = stat
+            return False
+
+        # 更新日時だけが変わった場合は内容のハッシュで比較して再読込を省く
+        digest = file_digest(self.path)
+        reloaded = digest != get_patient_master().source_digest
+        if reloaded:
+            swap_patient_master(build_patient_master(self.path, digest))
+        # 読み込みに失敗した場合は次回の確認でやり直す
+        self._last_stat = stat
+        self._pending_stat = None
+        return reloaded
+
+    def stop(self):
+        self._stop_event.set()
+
+
+def start_patient_master_watcher(path=PATIENT_CSV_PATH, interval=60.0):
+    watcher = PatientMasterWatcher(path, interval)
+    watcher.start()
+    return watcher
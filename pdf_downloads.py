@@ -0,0 +1,41 @@
+import os
+import secrets
+import time
+from threading import Lock
+from typing import NamedTuple
+
+# ダウンロード用トークンの有効期間（秒）
+PDF_DOWNLOAD_TTL = int(os.environ.get("PDF_DOWNLOAD_TTL", 300))
+
+
+class PdfDownload(NamedTuple):
+    file_name: str
+    data: bytes
+    expires_at: float
+
+
+_downloads = {}
+_downloads_lock = Lock()
+
+
+def _purge_expired(now):
+    for token in [token for token, download in _downloads.items() if download.expires_at <= now]:
+        del _downloads[token]
+
+
+def register_pdf(file_name, data, ttl=PDF_DOWNLOAD_TTL):
+    # 作成したPDFをメモリに保持し、推測できない使い捨てのトークンを返す
+    token = secrets.token_urlsafe(16)
+    now = time.monotonic()
+    with _downloads_lock:
+        _purge_expired(now)
+        _downloads[token] = PdfDownload(file_name, data, now + ttl)
+    return token
+
+
+def pop_pdf(token):
+    # 1回取り出したPDFは削除し、同じURLでは再びダウンロードできないようにする
+    now = time.monotonic()
+    with _downloads_lock:
+        _purge_expired(now)
+        return _downloads.pop(token, None)
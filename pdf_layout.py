@@ -0,0 +1,50 @@
+import os
+
+from reportlab.lib import colors
+from reportlab.lib.pagesizes import A4
+from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
+from reportlab.pdfbase import pdfmetrics
+from reportlab.pdfbase.ttfonts import TTFont
+from reportlab.platypus import TableStyle
+
+# 計画書PDFのレイアウト。スタイルやフォントはプロセスごとに一度だけ作成して使い回す
+FONT_NAME = 'IPAexGothic'
+# 日本語フォントのファイル（既定は作業ディレクトリの IPAexゴシック）
+FONT_PATH = os.environ.get("PDF_FONT_PATH", 'ipaexg.ttf')
+PAGE_SIZE = A4
+
+
+def register_fonts():
+    # 日本語フォントの登録（登録済みなら何もしない）
+    if FONT_NAME not in pdfmetrics.getRegisteredFontNames():
+        pdfmetrics.registerFont(TTFont(FONT_NAME, FONT_PATH))
+
+
+register_fonts()
+
+_sample_styles = getSampleStyleSheet()
+
+# 共有のサンプルスタイルを書き換えないよう、継承したスタイルを作る
+TITLE_STYLE = ParagraphStyle(name='JapaneseTitle', parent=_sample_styles['Title'], fontName=FONT_NAME)
+NORMAL_STYLE = ParagraphStyle(name='Japanese', fontName=FONT_NAME)
+
+
+def _table_style(header_background, body_background, header_text_color):
+    return TableStyle([
+        ('BACKGROUND', (0, 0), (-1, 0), header_background),
+        ('TEXTCOLOR', (0, 0), (-1, 0), header_text_color),
+        ('ALIGN', (0, 0), (-1, -1), 'LEFT'),
+        ('FONTNAME', (0, 0), (-1, 0), FONT_NAME),
+        ('BOTTOMPADDING', (0, 0), (-1, 0), 12),
+        ('BACKGROUND', (0, 1), (-1, -1), body_background),
+        ('GRID', (0, 0), (-1, -1), 1, colors.black)
+    ])
+
+
+PATIENT_INFO_TABLE_STYLE = _table_style(colors.grey, colors.beige, colors.whitesmoke)
+TARGET_TABLE_STYLE = _table_style(colors.lightgrey, colors.whitesmoke, colors.black)
+PLAN_TABLE_STYLE = TARGET_TABLE_STYLE
+
+PATIENT_INFO_COL_WIDTHS = [100, 200]
+TARGET_COL_WIDTHS = [100, 150, 150, 150]
+PLAN_COL_WIDTHS = [200, 300]
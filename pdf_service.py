@@ -0,0 +1,153 @@
+import asyncio
+import io
+import multiprocessing
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from threading import Lock
+from types import SimpleNamespace
+
+from reportlab.platypus import SimpleDocTemplate, Table, Paragraph, Spacer, PageBreak
+
+from metrics import counter, histogram, timer
+from models import PatientInfo
+from pdf_layout import (PAGE_SIZE, TITLE_STYLE, NORMAL_STYLE, PATIENT_INFO_TABLE_STYLE, TARGET_TABLE_STYLE,
+                        PLAN_TABLE_STYLE, PATIENT_INFO_COL_WIDTHS, TARGET_COL_WIDTHS, PLAN_COL_WIDTHS)
+
+# PDF作成に使うワーカープロセス数
+PDF_WORKERS = int(os.environ.get("PDF_WORKERS", max(1, (os.cpu_count() or 1) - 1)))
+
+
+def build_plan_elements(patient_info):
+    elements = []
+
+    title_style = TITLE_STYLE
+    normal_style = NORMAL_STYLE
+
+    # タイトル
+    title = Paragraph("生活習慣病療養計画書", title_style)
+    elements.append(title)
+    elements.append(Spacer(1, 12))
+
+    # 患者情報
+    patient_info_data = [
+        [Paragraph("発行日", normal_style), Paragraph(patient_info.issue_date.strftime("%Y/%m/%d"), normal_style)],
+        [Paragraph("氏名", normal_style), Paragraph(patient_info.patient_name, normal_style)],
+        [Paragraph("生年月日", normal_style), Paragraph(patient_info.birthdate.strftime("%Y/%m/%d"), normal_style)],
+        [Paragraph("性別", normal_style), Paragraph(patient_info.gender, normal_style)]
+    ]
+    patient_info_table = Table(patient_info_data, colWidths=PATIENT_INFO_COL_WIDTHS)
+    patient_info_table.setStyle(PATIENT_INFO_TABLE_STYLE)
+
+    elements.append(patient_info_table)
+    elements.append(Spacer(1, 12))
+
+    # 目標
+    target_data = [
+        [Paragraph(f"主病名 {patient_info.main_diagnosis}", normal_style),
+         Paragraph(f"{patient_info.sheet_name}", normal_style),
+         Paragraph(f"目標体重 {patient_info.target_weight}kg", normal_style)]
+    ]
+    target_table = Table(target_data, colWidths=TARGET_COL_WIDTHS)
+    target_table.setStyle(TARGET_TABLE_STYLE)
+    elements.append(target_table)
+    elements.append(Spacer(1, 12))
+
+    # 計画内容
+    plan_data = [
+        [Paragraph("目標", normal_style), Paragraph("内容", normal_style)],
+        [Paragraph("【①達成目標】", normal_style), Paragraph(patient_info.goal1, normal_style)],
+        [Paragraph("【②行動目標】", normal_style), Paragraph(patient_info.goal2, normal_style)],
+        [Paragraph("運動処方", normal_style), Paragraph(patient_info.exercise_prescription, normal_style)],
+        [Paragraph("時間", normal_style), Paragraph(patient_info.exercise_time, normal_style)],
+        [Paragraph("頻度", normal_style), Paragraph(patient_info.exercise_frequency, normal_style)],
+        [Paragraph("強度", normal_style), Paragraph(patient_info.exercise_intensity, normal_style)],
+        [Paragraph("日常生活での活動量の増加", normal_style), Paragraph(patient_info.daily_activity, normal_style)],
+        [Paragraph("非喫煙者である", normal_style),
+         Paragraph("はい" if patient_info.nonsmoker else "いいえ", normal_style)],
+        [Paragraph("禁煙の実施方法等を指示", normal_style),
+         Paragraph("いいえ" if patient_info.smoking_cessation else "はい", normal_style)],
+        [Paragraph("その他1", normal_style), Paragraph(patient_info.other1, normal_style)],
+        [Paragraph("その他2", normal_style), Paragraph(patient_info.other2, normal_style)]
+    ]
+
+    plan_table = Table(plan_data, colWidths=PLAN_COL_WIDTHS)
+    plan_table.setStyle(PLAN_TABLE_STYLE)
+    elements.append(plan_table)
+    return elements
+
+
+def _build_document(elements):
+    # ファイルには書き出さずメモリ上で作成したPDFのバイト列を返す
+    buffer = io.BytesIO()
+    doc = SimpleDocTemplate(buffer, pagesize=PAGE_SIZE)
+    doc.build(elements)
+    return buffer.getvalue()
+
+
+def create_pdf(patient_info):
+    return _build_document(build_plan_elements(patient_info))
+
+
+def create_pdfs(patient_infos):
+    # 一括印刷用：複数の計画書をそれぞれ別のPDFとして作成する
+    return [create_pdf(patient_info) for patient_info in patient_infos]
+
+
+def create_merged_pdf(patient_infos):
+    # 一括印刷用：複数の計画書を改ページで区切って1つのPDFにまとめる
+    elements = []
+    for patient_info in patient_infos:
+        if elements:
+            elements.append(PageBreak())
+        elements.extend(build_plan_elements(patient_info))
+    return _build_document(elements)
+
+
+_executor = None
+_executor_lock = Lock()
+
+
+def get_pdf_executor():
+    # ReportLab はCPU処理のためプロセスプールで並列に作成する
+    global _executor
+    if _executor is None:
+        with _executor_lock:
+            if _executor is None:
+                _executor = ProcessPoolExecutor(max_workers=PDF_WORKERS,
+                                                mp_context=multiprocessing.get_context("spawn"))
+    return _executor
+
+
+def shutdown_pdf_executor():
+    global _executor
+    with _executor_lock:
+        if _executor is not None:
+            _executor.shutdown(wait=True)
+            _executor = None
+
+
+def snapshot_patient_info(patient_info):
+    # ワーカープロセスへ渡せるようにセッションから切り離した値だけを取り出す
+    return SimpleNamespace(**{column.name: getattr(patient_info, column.name)
+                              for column in PatientInfo.__table__.columns})
+
+
+def _create_pdf_timed(patient_info):
+    # ワーカープロセス内の計測値は親プロセスに届かないため、作成時間を結果と一緒に返す
+    started = time.perf_counter()
+    pdf_data = create_pdf(patient_info)
+    return pdf_data, time.perf_counter() - started
+
+
+def submit_pdf(patient_info):
+    return get_pdf_executor().submit(_create_pdf_timed, snapshot_patient_info(patient_info))
+
+
+async def render_pdf_async(patient_info):
+    # 待ち時間を含めた全体の時間と、ワーカーでの作成時間を分けて記録する
+    with timer("pdf_render_seconds", "PDF作成の依頼から受け取りまでの所要時間"):
+        pdf_data, elapsed = await asyncio.wrap_future(submit_pdf(patient_info))
+    histogram("pdf_create_seconds", "ワーカープロセスでのPDF作成の所要時間").observe(elapsed)
+    counter("pdf_created_total", "作成したPDFの件数").inc()
+    return pdf_data
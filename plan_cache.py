@@ -0,0 +1,88 @@
+import os
+import threading
+import weakref
+from collections import OrderedDict
+
+from metrics import counter
+
+# 1セッションが保持する計画書の最大件数
+PLAN_CACHE_SIZE = int(os.environ.get("PLAN_CACHE_SIZE", 200))
+
+# 更新・削除を全セッションのキャッシュに伝えるため、作成したキャッシュを控えておく
+_caches = weakref.WeakSet()
+_caches_lock = threading.Lock()
+# 計画書を更新・削除するたびに1つ増やす（読み込み中に更新された古い計画書をキャッシュに入れないため）
+_generation = 0
+# 計画書ID → 最後に更新・削除されたときの _generation（他の計画書の読み込みは捨てずに済むよう、IDごとに控える）
+INVALIDATED_PLANS_SIZE = int(os.environ.get("INVALIDATED_PLANS_SIZE", 10000))
+_invalidated = OrderedDict()
+# 上限を超えて控えから外した分のうち、最も新しい _generation（これより前に読み込んだものは全件捨てる）
+_forgotten_generation = 0
+
+
+def invalidation_generation():
+    # DBから読み込む前に控えておき、put_many に渡す
+    return _generation
+
+
+class PlanRecordCache:
+    # セッションごとに持つ計画書（PatientInfo）の LRU キャッシュ。
+    # 一覧を表示するときに1ページ分をまとめて読み込み、選択・編集・印刷ではDBに問い合わせずにここから取り出す。
+    def __init__(self, maxsize=PLAN_CACHE_SIZE):
+        self.maxsize = maxsize
+        self._records = OrderedDict()
+        self._lock = threading.Lock()
+        with _caches_lock:
+            _caches.add(self)
+
+    def get(self, plan_id):
+        plan_id = int(plan_id)
+        with self._lock:
+            record = self._records.get(plan_id)
+            if record is not None:
+                self._records.move_to_end(plan_id)
+        if record is None:
+            counter("plan_cache_misses_total", "計画書キャッシュに無くDBから読み込んだ回数").inc()
+        else:
+            counter("plan_cache_hits_total", "計画書キャッシュから取り出せた回数").inc()
+        return record
+
+    def put(self, record, generation=None):
+        self.put_many([record], generation)
+
+    def put_many(self, records, generation=None):
+        # generation は読み込む前の invalidation_generation()。読み込みの間に他のセッションが
+        # 更新・削除した計画書は、古い内容の可能性があるためキャッシュに入れない
+        with self._lock:
+            if generation is not None:
+                with _caches_lock:
+                    if generation < _forgotten_generation:
+                        return
+                    records = [record for record in records if _invalidated.get(record.id, 0) <= generation]
+            for record in records:
+                self._records[record.id] = record
+                self._records.move_to_end(record.id)
+            while len(self._records) > self.maxsize:
+                self._records.popitem(last=False)
+
+    def discard(self, plan_id):
+        with self._lock:
+            self._records.pop(int(plan_id), None)
+
+    def __len__(self):
+        return len(self._records)
+
+
+def invalidate_plan(plan_id):
+    # 計画書を更新・削除したときに、全セッションのキャッシュから取り除く
+    global _generation, _forgotten_generation
+    plan_id = int(plan_id)
+    with _caches_lock:
+        _generation += 1
+        _invalidated[plan_id] = _generation
+        _invalidated.move_to_end(plan_id)
+        while len(_invalidated) > INVALIDATED_PLANS_SIZE:
+            _, _forgotten_generation = _invalidated.popitem(last=False)
+        caches = list(_caches)
+    for cache in caches:
+        cache.discard(plan_id)
@@ -0,0 +1,117 @@
+import os
+import tempfile
+import zipfile
+from itertools import islice
+
+from openpyxl import Workbook
+from openpyxl.utils.cell import coordinate_from_string
+
+from batch_print import query_plans
+from database import Session
+from models import PatientInfo
+from plan_sheet import COMMON_SHEET_CELLS, COMMON_SHEET_FIELDS, common_sheet_values
+
+# DBから1回に読み込む件数
+EXPORT_CHUNK_SIZE = 1000
+# ZIP に出力する場合の Excel 1ファイルあたりの件数
+# （openpyxl はシート数が増えると保存が遅くなるため、1シート1件の形式はファイルを分ける）
+EXPORT_BOOK_SIZE = 1000
+# Excel の1シートの最大行数（超えた分は次のシートに続ける）
+EXCEL_MAX_ROWS = 1048576
+ROWS_SHEET_TITLE = "計画書"
+# 共通シートの各項目の行番号（B2 → 2）
+COMMON_SHEET_ROWS = [coordinate_from_string(cell)[1] for cell, _ in COMMON_SHEET_CELLS]
+
+
+def _query_values(session, start_date, end_date, doctor_id, department):
+    # 書き出す列だけを読み込み、ORMのオブジェクトを作らない
+    query = query_plans(session, start_date, end_date, doctor_id, department)
+    return query.with_entities(PatientInfo.id, *[getattr(PatientInfo, field) for field in COMMON_SHEET_FIELDS])
+
+
+def _write_rows(workbook, plans):
+    # 1行に1件（1行目は列名）
+    worksheet = None
+    sheet_number = 0
+    row_count = EXCEL_MAX_ROWS
+    for plan in plans:
+        if row_count >= EXCEL_MAX_ROWS:
+            sheet_number += 1
+            title = ROWS_SHEET_TITLE if sheet_number == 1 else f"{ROWS_SHEET_TITLE}{sheet_number}"
+            worksheet = workbook.create_sheet(title)
+            worksheet.append(COMMON_SHEET_FIELDS)
+            row_count = 1
+        worksheet.append(common_sheet_values(plan))
+        row_count += 1
+    if worksheet is None:
+        workbook.create_sheet(ROWS_SHEET_TITLE).append(COMMON_SHEET_FIELDS)
+
+
+def _write_sheets(workbook, plans):
+    # 1シートに1件（共通シートと同じく B2〜B26、A列は項目名）。
+    # 書き終えたシートはすぐに閉じ、シートの数だけファイルを開いたままにしない
+    for plan in plans:
+        worksheet = workbook.create_sheet(str(plan.id))
+        rows = {row: [field, value]
+                for row, field, value in zip(COMMON_SHEET_ROWS, COMMON_SHEET_FIELDS, common_sheet_values(plan))}
+        worksheet.append(["計画書ID", plan.id])
+        for row in range(2, max(COMMON_SHEET_ROWS) + 1):
+            worksheet.append(rows.get(row, []))
+        worksheet.close()
+    if not workbook.worksheets:
+        workbook.create_sheet(ROWS_SHEET_TITLE)
+
+
+def write_workbook(output, plans, layout="rows"):
+    # 書き込み専用モードのため、行は一時ファイルに流され、件数が増えてもメモリの使用量は変わらない
+    workbook = Workbook(write_only=True)
+    if layout == "sheet":
+        _write_sheets(workbook, plans)
+    else:
+        _write_rows(workbook, plans)
+    workbook.save(output)
+
+
+def _count_progress(plans, total, progress):
+    done = 0
+    for plan in plans:
+        yield plan
+        done += 1
+        if done % EXPORT_CHUNK_SIZE == 0:
+            progress(done, total)
+
+
+def export_plans(output_path, start_date=None, end_date=None, doctor_id=None, department=None, layout="rows",
+                 output_format="xlsx", chunk_size=EXPORT_CHUNK_SIZE, progress=None):
+    # 条件に合う計画書を Excel に書き出す（layout="rows": 1行1件 / "sheet": 1シート1件の共通シート形式）。
+    # output_format="zip" の場合は EXPORT_BOOK_SIZE 件ずつの Excel ファイルに分けて1つのZIPにまとめる
+    if layout not in ("rows", "sheet"):
+        raise ValueError("layout は rows または sheet を指定してください")
+    session = Session()
+    try:
+        query = _query_values(session, start_date, end_date, doctor_id, department)
+        total = query.count()
+        plans = query.yield_per(chunk_size)
+        if progress:
+            plans = _count_progress(plans, total, progress)
+
+        if output_format == "zip":
+            # Excel は圧縮済みのため ZIP には無圧縮で格納する
+            with zipfile.ZipFile(output_path, "w", compression=zipfile.ZIP_STORED) as archive:
+                book_number = 0
+                while book_number * EXPORT_BOOK_SIZE < total:
+                    book_number += 1
+                    fd, book_path = tempfile.mkstemp(suffix=".xlsx")
+                    os.close(fd)
+                    try:
+                        write_workbook(book_path, islice(plans, EXPORT_BOOK_SIZE), layout)
+                        archive.write(book_path, f"計画書_{book_number:04d}.xlsx")
+                    finally:
+                        os.remove(book_path)
+        else:
+            write_workbook(output_path, plans, layout)
+    finally:
+        session.close()
+    if progress:
+        progress(total, total)
+    return total
@@ -0,0 +1,190 @@
+import csv
+import os
+import time
+from datetime import date, datetime
+from typing import NamedTuple
+
+from openpyxl import load_workbook
+from sqlalchemy import Date, Float, Integer, insert, select, update
+
+from database import engine
+from models import ImportProgress, PatientInfo
+from patient_master import file_digest
+from plan_sheet import COMMON_SHEET_FIELDS, COMMON_SHEET_FIRST_ROW
+
+# 1トランザクションで挿入する件数
+IMPORT_BATCH_SIZE = 5000
+# 必須の項目
+REQUIRED_FIELDS = ["patient_id", "issue_date"]
+DATE_FORMATS = ["%Y/%m/%d", "%Y-%m-%d", "%Y%m%d"]
+
+
+class ImportResult(NamedTuple):
+    imported: int
+    rejected: int
+    skipped: int
+    elapsed: float
+    errors: list
+
+    @property
+    def rows_per_second(self):
+        return self.imported / self.elapsed if self.elapsed else 0.0
+
+
+def parse_date(value):
+    if isinstance(value, datetime):
+        return value.date()
+    if isinstance(value, date):
+        return value
+    value = str(value).strip()
+    for date_format in DATE_FORMATS:
+        try:
+            return datetime.strptime(value, date_format).date()
+        except ValueError:
+            continue
+    raise ValueError(f"日付として読めません: {value}")
+
+
+def parse_flag(value):
+    # 画面と同じく "True" / "False" の文字列で保存する
+    if isinstance(value, str):
+        return str(value.strip().lower() in ("true", "1", "yes", "はい", "○"))
+    return str(bool(value))
+
+
+def _column_parsers():
+    parsers = {}
+    for field in COMMON_SHEET_FIELDS:
+        column_type = PatientInfo.__table__.columns[field].type
+        if isinstance(column_type, Integer):
+            parsers[field] = lambda value: int(float(value))
+        elif isinstance(column_type, Float):
+            parsers[field] = float
+        elif isinstance(column_type, Date):
+            parsers[field] = parse_date
+        else:
+            parsers[field] = str
+    parsers["nonsmoker"] = parse_flag
+    parsers["smoking_cessation"] = parse_flag
+    return parsers
+
+
+COLUMN_PARSERS = _column_parsers()
+
+
+def validate_plan(values):
+    # 1件分の値を PatientInfo の列の型に変換する（不正な値は ValueError）
+    plan = {}
+    for field in COMMON_SHEET_FIELDS:
+        value = values.get(field)
+        if isinstance(value, str):
+            value = value.strip()
+        if value is None or value == "":
+            if field in REQUIRED_FIELDS:
+                raise ValueError(f"{field} は必須です")
+            plan[field] = None
+            continue
+        try:
+            plan[field] = COLUMN_PARSERS[field](value)
+        except (TypeError, ValueError) as e:
+            raise ValueError(f"{field}: {e}")
+    if plan["creation_count"] is None:
+        plan["creation_count"] = 1
+    return plan
+
+
+def iter_csv_rows(path, encoding="utf-8-sig"):
+    # 1行目を列名（PatientInfo の列名）として読む
+    with open(path, encoding=encoding, newline="") as f:
+        yield from csv.DictReader(f)
+
+
+def iter_xlsx_rows(path):
+    workbook = load_workbook(path, read_only=True, data_only=True)
+    try:
+        rows = workbook.worksheets[0].iter_rows(values_only=True)
+        header = [str(name).strip() if name is not None else "" for name in next(rows, [])]
+        for row in rows:
+            yield dict(zip(header, row))
+    finally:
+        workbook.close()
+
+
+def iter_xlsx_sheets(path):
+    # 共通シートの形式（1シートに1件、B2〜B26）で読む
+    workbook = load_workbook(path, read_only=True, data_only=True)
+    try:
+        for worksheet in workbook.worksheets:
+            rows = worksheet.iter_rows(min_row=COMMON_SHEET_FIRST_ROW,
+                                       max_row=COMMON_SHEET_FIRST_ROW + len(COMMON_SHEET_FIELDS) - 1,
+                                       min_col=2, max_col=2, values_only=True)
+            yield {field: row[0] for field, row in zip(COMMON_SHEET_FIELDS, rows)}
+    finally:
+        workbook.close()
+
+
+def iter_plan_rows(path, layout="rows", encoding="utf-8-sig"):
+    if os.path.splitext(path)[1].lower() in (".xlsx", ".xlsm"):
+        return iter_xlsx_sheets(path) if layout == "sheet" else iter_xlsx_rows(path)
+    if layout == "sheet":
+        raise ValueError("共通シート形式（--layout sheet）は Excel ファイルのみ指定できます")
+    return iter_csv_rows(path, encoding)
+
+
+def _load_progress(connection, digest):
+    return connection.execute(select(ImportProgress).where(ImportProgress.source_digest == digest)).first()
+
+
+def _save_progress(connection, digest, source_name, rows_done, rows_imported, completed=False):
+    values = {"rows_done": rows_done, "rows_imported": rows_imported, "completed": completed,
+              "updated_at": datetime.now()}
+    updated = connection.execute(update(ImportProgress).where(ImportProgress.source_digest == digest).values(**values))
+    if updated.rowcount == 0:
+        connection.execute(insert(ImportProgress).values(source_digest=digest, source_name=source_name, **values))
+
+
+def import_plans(path, layout="rows", encoding="utf-8-sig", batch_size=IMPORT_BATCH_SIZE, restart=False,
+                 progress=None):
+    # 計画書の履歴を batch_size 件ずつ1トランザクションで挿入する。
+    # 進み具合は同じトランザクションで記録するため、中断しても次回は続きの行から取り込む。
+    digest = file_digest(path)
+    source_name = os.path.basename(path)
+    with engine.begin() as connection:
+        saved = _load_progress(connection, digest)
+    rows_done = rows_imported = 0
+    if saved is not None and not restart:
+        if saved.completed:
+            raise ValueError(f"{source_name} は取り込み済みです（やり直す場合は --restart を指定してください）")
+        rows_done, rows_imported = saved.rows_done, saved.rows_imported
+
+    started = time.perf_counter()
+    skipped = rows_done
+    imported = rejected = 0
+    errors = []
+    batch = []
+    row_number = 0
+
+    def flush(completed=False):
+        nonlocal batch, imported
+        with engine.begin() as connection:
+            if batch:
+                connection.execute(insert(PatientInfo), batch)
+            _save_progress(connection, digest, source_name, row_number, rows_imported + imported + len(batch),
+                           completed)
+        imported += len(batch)
+        batch = []
+        if progress:
+            progress(row_number, imported, time.perf_counter() - started)
+
+    for row_number, values in enumerate(iter_plan_rows(path, layout, encoding), start=1):
+        if row_number <= rows_done:
+            continue
+        try:
+            batch.append(validate_plan(values))
+        except ValueError as e:
+            rejected += 1
+            errors.append((row_number, str(e)))
+        if row_number % batch_size == 0:
+            flush()
+    flush(completed=True)
+    return ImportResult(imported, rejected, skipped, time.perf_counter() - started, errors)
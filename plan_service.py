@@ -0,0 +1,213 @@
+from datetime import datetime
+
+from sqlalchemy import delete, select, update
+
+from database import AsyncSession, Session
+from models import PatientInfo
+from patient_master import get_patient_master
+from plan_cache import invalidate_plan
+from pdf_service import create_pdf
+from template_manager import template_manager
+
+
+# 画面の入力欄の値（文字列）を列の型に変換する列。
+# SQLite は文字列のままでも受け付けるが、asyncpg（PostgreSQL）は整数・小数の列に文字列を渡すとエラーになる
+INTEGER_FIELDS = ["patient_id", "doctor_id", "creation_count"]
+FLOAT_FIELDS = ["target_weight"]
+
+
+def to_int(value):
+    if value is None or value == "":
+        return None
+    return int(value)
+
+
+def to_float(value):
+    if value is None or value == "":
+        return None
+    return float(value)
+
+
+def normalize_plan_values(values):
+    values = dict(values)
+    for field in INTEGER_FIELDS:
+        if field in values:
+            values[field] = to_int(values[field])
+    for field in FLOAT_FIELDS:
+        if field in values:
+            values[field] = to_float(values[field])
+    return values
+
+
+def build_plan(patient_record, doctor_id, doctor_name, department, main_diagnosis, sheet_name, creation_count=1,
+               target_weight=None, **fields):
+    # 患者マスタの情報と入力内容から計画書を作成する
+    return PatientInfo(
+        patient_id=patient_record.patient_id,
+        patient_name=patient_record.name,
+        kana=patient_record.kana,
+        gender=patient_record.gender,
+        birthdate=patient_record.birthdate,
+        issue_date=datetime.now().date(),
+        doctor_id=to_int(doctor_id),
+        doctor_name=doctor_name,
+        department=department,
+        main_diagnosis=main_diagnosis,
+        sheet_name=sheet_name,
+        creation_count=to_int(creation_count),
+        target_weight=to_float(target_weight),
+        goal1=fields.get("goal1"),
+        goal2=fields.get("goal2"),
+        diet=fields.get("diet"),
+        exercise_prescription=fields.get("exercise_prescription"),
+        exercise_time=fields.get("exercise_time"),
+        exercise_frequency=fields.get("exercise_frequency"),
+        exercise_intensity=fields.get("exercise_intensity"),
+        daily_activity=fields.get("daily_activity"),
+        nonsmoker=str(bool(fields.get("nonsmoker"))),
+        smoking_cessation=str(bool(fields.get("smoking_cessation"))),
+        other1=fields.get("other1"),
+        other2=fields.get("other2")
+    )
+
+
+def save_plan(patient_record, doctor_id, doctor_name, department, main_diagnosis, sheet_name, creation_count=1,
+              target_weight=None, **fields):
+    # 患者マスタの情報と入力内容から計画書を作成してデータベースに保存する
+    treatment_plan = build_plan(patient_record, doctor_id, doctor_name, department, main_diagnosis, sheet_name,
+                                creation_count, target_weight, **fields)
+    session = Session()
+    session.add(treatment_plan)
+    session.commit()
+    session.refresh(treatment_plan)
+    session.close()
+    return treatment_plan
+
+
+def create_plan(patient_id, main_disease, sheet_name, doctor_id=None, doctor_name=None, department=None,
+                creation_count=1, target_weight=None, **fields):
+    # 画面を使わずに、患者IDとテンプレートから計画書を作成する（指定しなかった医師情報は患者マスタの値を使う）
+    patient_record = get_patient_master().get(patient_id)
+    if patient_record is None:
+        raise ValueError(f"患者ID {patient_id} が見つかりません。")
+
+    template = template_manager.get_template(main_disease, sheet_name)
+    if template is None:
+        raise ValueError(f"テンプレート（{main_disease} / {sheet_name}）が見つかりません。")
+
+    plan_fields = dict(template)
+    plan_fields.update(fields)
+    return save_plan(
+        patient_record,
+        doctor_id if doctor_id is not None else patient_record.doctor_id,
+        doctor_name if doctor_name is not None else patient_record.doctor_name,
+        department if department is not None else patient_record.department,
+        main_disease,
+        sheet_name,
+        creation_count,
+        target_weight,
+        **plan_fields
+    )
+
+
+def get_plan(plan_id):
+    session = Session()
+    patient_info = session.query(PatientInfo).filter(PatientInfo.id == plan_id).first()
+    session.close()
+    return patient_info
+
+
+def render_plan(plan_id):
+    patient_info = get_plan(plan_id)
+    if patient_info is None:
+        raise ValueError(f"計画書ID {plan_id} が見つかりません。")
+    return patient_info, create_pdf(patient_info)
+
+
+def plan_to_dict(patient_info):
+    values = {}
+    for column in PatientInfo.__table__.columns:
+        value = getattr(patient_info, column.name)
+        values[column.name] = value.isoformat() if hasattr(value, "isoformat") else value
+    return values
+
+
+# 以下は画面のイベントハンドラ用の非同期版。DBを待つ間も他のセッションのイベントを処理できる
+
+async def save_plan_async(patient_record, doctor_id, doctor_name, department, main_diagnosis, sheet_name,
+                          creation_count=1, target_weight=None, **fields):
+    treatment_plan = build_plan(patient_record, doctor_id, doctor_name, department, main_diagnosis, sheet_name,
+                                creation_count, target_weight, **fields)
+    async with AsyncSession() as session:
+        session.add(treatment_plan)
+        await session.commit()
+    return treatment_plan
+
+
+async def add_plan_async(**values):
+    treatment_plan = PatientInfo(**normalize_plan_values(values))
+    async with AsyncSession() as session:
+        session.add(treatment_plan)
+        await session.commit()
+    return treatment_plan
+
+
+async def get_plan_async(plan_id):
+    async with AsyncSession() as session:
+        return await session.get(PatientInfo, int(plan_id))
+
+
+async def update_plan_async(plan_id, **values):
+    # 読み込まずに UPDATE だけを実行し、更新できたかどうかを返す
+    async with AsyncSession() as session:
+        result = await session.execute(update(PatientInfo).where(PatientInfo.id == int(plan_id))
+                                       .values(**normalize_plan_values(values)))
+        await session.commit()
+    invalidate_plan(plan_id)
+    return result.rowcount > 0
+
+
+async def copy_latest_plan_async(patient_id):
+    # 患者の最新の計画書を今日の日付・作成回数+1で複製する
+    patient_id = int(patient_id)
+    async with AsyncSession() as session:
+        patient_info = await session.scalar(
+            select(PatientInfo).filter(PatientInfo.patient_id == patient_id).order_by(PatientInfo.id.desc()).limit(1))
+        if patient_info is None:
+            return None
+        values = {column.name: getattr(patient_info, column.name) for column in PatientInfo.__table__.columns
+                  if column.name != "id"}
+        values["issue_date"] = datetime.now().date()
+        values["creation_count"] = patient_info.creation_count + 1
+        new_patient_info = PatientInfo(**values)
+        session.add(new_patient_info)
+        await session.commit()
+    return new_patient_info
+
+
+async def delete_plan_async(plan_id):
+    # 指定した計画書を削除し、削除したIDを返す（既に削除されていた場合は None）
+    plan_id = int(plan_id)
+    async with AsyncSession() as session:
+        result = await session.execute(delete(PatientInfo).where(PatientInfo.id == plan_id))
+        await session.commit()
+    if result.rowcount == 0:
+        return None
+    invalidate_plan(plan_id)
+    return plan_id
+
+
+async def fetch_plan_history_async(patient_id, before_id=None, limit=20):
+    # IDの降順にキーセット方式で1ページ分だけ取得し、次のページがあるかどうかも返す。
+    # 選択・編集・印刷で再度問い合わせなくて済むよう、一覧に出ない列も含めて1回で読み込む
+    patient_id = int(patient_id)
+    query = select(PatientInfo). \
+        filter(PatientInfo.patient_id == patient_id). \
+        order_by(PatientInfo.patient_id.asc(), PatientInfo.id.desc())
+    if before_id is not None:
+        query = query.filter(PatientInfo.id < before_id)
+
+    async with AsyncSession() as session:
+        result = await session.scalars(query.limit(limit + 1))
+        patient_info_list = result.all()
+    return patient_info_list[:limit], len(patient_info_list) > limit
@@ -0,0 +1,49 @@
+# Excel 時代の計画書の共通シートのセル配置（1件の計画書を B2〜B26 に縦に並べる）
+COMMON_SHEET_CELLS = [
+    ("B2", "patient_id"),
+    ("B3", "patient_name"),
+    ("B4", "kana"),
+    ("B5", "gender"),
+    ("B6", "birthdate"),
+    ("B7", "issue_date"),
+    ("B8", "doctor_id"),
+    ("B9", "doctor_name"),
+    ("B10", "department"),
+    ("B11", "main_diagnosis"),
+    ("B12", "creation_count"),
+    ("B13", "target_weight"),
+    ("B14", "sheet_name"),
+    ("B15", "goal1"),
+    ("B16", "goal2"),
+    ("B17", "diet"),
+    ("B18", "exercise_prescription"),
+    ("B19", "exercise_time"),
+    ("B20", "exercise_frequency"),
+    ("B21", "exercise_intensity"),
+    ("B22", "daily_activity"),
+    ("B23", "nonsmoker"),
+    ("B24", "smoking_cessation"),
+    ("B25", "other1"),
+    ("B26", "other2"),
+]
+COMMON_SHEET_FIELDS = [field for _, field in COMMON_SHEET_CELLS]
+# 共通シートの1行目（B2）の行番号
+COMMON_SHEET_FIRST_ROW = 2
+
+
+def common_sheet_values(patient_info):
+    # 共通シートに書き込む値を B2 から順に返す
+    values = []
+    for field in COMMON_SHEET_FIELDS:
+        value = getattr(patient_info, field)
+        if field == "issue_date":
+            value = value.strftime("%Y/%m/%d")
+        elif field in ("nonsmoker", "smoking_cessation"):
+            value = str(value)
+        values.append(value)
+    return values
+
+
+def populate_common_sheet(common_sheet, patient_info):
+    for (cell, _), value in zip(COMMON_SHEET_CELLS, common_sheet_values(patient_info)):
+        common_sheet[cell] = value
@@ -0,0 +1,24 @@
+from plan_cache import PlanRecordCache
+
+
+class SessionState:
+    # Fletのセッション（ブラウザのタブ）ごとに持つ画面の状態。
+    # モジュールのグローバル変数にすると同じプロセスの他のセッションと共有されてしまうため、ここにまとめる。
+    def __init__(self):
+        self.selected_row = None
+        # 一覧に表示している患者ID（整数、未指定は None）
+        self.history_patient_id = None
+        self.history_cursors = [None]
+        # 一覧に表示した計画書の全項目（選択・編集・印刷はここから取り出す）
+        self.plan_records = PlanRecordCache()
+
+    def select_row(self, row_data):
+        self.selected_row = row_data
+
+    def reset_history(self, patient_id):
+        self.history_patient_id = patient_id
+        self.history_cursors = [None]
+
+    @property
+    def history_page_number(self):
+        return len(self.history_cursors)
@@ -0,0 +1,87 @@
+from threading import Lock
+
+from sqlalchemy import select
+
+from database import AsyncSession, Session
+from models import MainDisease, SheetName, Template
+
+# テンプレートから計画書にコピーする項目
+TEMPLATE_FIELDS = ["goal1", "goal2", "diet", "exercise_prescription", "exercise_time", "exercise_frequency",
+                   "exercise_intensity", "daily_activity", "nonsmoker", "other1", "other2"]
+
+
+class TemplateManager:
+    # 主病名・シート名・テンプレートをプロセス内で共有するキャッシュ。
+    # 初回参照時にまとめて読み込み、保存時はDBへのコミット後にキャッシュも書き換える。
+    def __init__(self):
+        self.templates = {}
+        self.main_diseases = {}
+        self.sheet_names = {}
+        self._loaded = False
+        self._lock = Lock()
+
+    def load(self):
+        session = Session()
+        main_diseases = {disease.name: disease.id for disease in session.query(MainDisease).order_by(MainDisease.id)}
+        sheet_names = {}
+        for sheet in session.query(SheetName).order_by(SheetName.id):
+            sheet_names.setdefault(sheet.main_disease_id, []).append(sheet.name)
+        templates = {}
+        for template in session.query(Template).order_by(Template.id):
+            templates.setdefault((template.main_disease, template.sheet_name),
+                                 {field: getattr(template, field) for field in TEMPLATE_FIELDS})
+        session.close()
+
+        with self._lock:
+            self.main_diseases = main_diseases
+            self.sheet_names = sheet_names
+            self.templates = templates
+            self._loaded = True
+
+    def _ensure_loaded(self):
+        if not self._loaded:
+            self.load()
+
+    def add_template(self, main_disease, sheet_name, template_data):
+        self._ensure_loaded()
+        with self._lock:
+            templates = dict(self.templates)
+            templates[(main_disease, sheet_name)] = dict(template_data)
+            self.templates = templates
+
+    def get_template(self, main_disease, sheet_name):
+        self._ensure_loaded()
+        return self.templates.get((main_disease, sheet_name))
+
+    def get_main_diseases(self):
+        self._ensure_loaded()
+        return list(self.main_diseases)
+
+    def get_main_disease_id(self, name):
+        self._ensure_loaded()
+        return self.main_diseases.get(name)
+
+    def get_sheet_names(self, main_disease_id=None):
+        self._ensure_loaded()
+        if main_disease_id:
+            return list(self.sheet_names.get(main_disease_id, []))
+        return [name for names in self.sheet_names.values() for name in names]
+
+    async def save_template_async(self, main_disease, sheet_name, template_data):
+        async with AsyncSession() as session:
+            # 重複がある場合もキャッシュと同じ（IDが最小の）テンプレートを更新する
+            template = await session.scalar(select(Template).filter(Template.main_disease == main_disease,
+                                                                    Template.sheet_name == sheet_name)
+                                           .order_by(Template.id).limit(1))
+            if template is None:
+                template = Template(main_disease=main_disease, sheet_name=sheet_name)
+                session.add(template)
+            for field in TEMPLATE_FIELDS:
+                setattr(template, field, template_data.get(field))
+            await session.commit()
+
+        # コミットできた内容だけをキャッシュに反映する
+        self.add_template(main_disease, sheet_name, template_data)
+
+
+template_manager = TemplateManager()
@@ -1,23 +1,175 @@
-from fastapi import FastAPI, Response
-from reportlab.pdfgen import canvas
-import io
+import os
+import tempfile
+from datetime import date
+from typing import Optional
+from urllib.parse import quote
 
-app = FastAPI()
+import flet.fastapi as flet_fastapi
+import uvicorn
+from fastapi import APIRouter, FastAPI, HTTPException, Response
+from fastapi.responses import FileResponse, PlainTextResponse
+from pydantic import BaseModel
+from starlette.background import BackgroundTask
+from starlette.concurrency import run_in_threadpool
 
-@app.get("/download_pdf")
-async def download_pdf():
-    # PDFファイルを生成する
-    buffer = io.BytesIO()
-    p = canvas.Canvas(buffer)
-    p.drawString(100, 100, "Hello, PDF!")
-    p.showPage()
-    p.save()
+from batch_print import batch_print
+from database import init_db
+from metrics import render_prometheus
+from pdf_downloads import pop_pdf
+from pdf_service import render_pdf_async, shutdown_pdf_executor
+from plan_export import export_plans
+from plan_service import create_plan, get_plan, plan_to_dict
 
-    # バイトストリームを先頭に戻す
-    buffer.seek(0)
+# 画面なしで使う API（スクリプト・負荷試験用）。患者の情報をそのまま返すため認証は行わず、
+# 画面のサーバー（main.py）には含めずに「python testapp.py」または「uvicorn testapp:app」で
+# ローカルホストだけに公開する
+API_HOST = os.environ.get("API_HOST", "127.0.0.1")
+API_PORT = int(os.environ.get("API_PORT", 8001))
 
-    # レスポンスを作成し、ヘッダを設定する
-    response = Response(content=buffer.getvalue(), media_type="application/pdf")
-    response.headers["Content-Disposition"] = "attachment; filename=example.pdf"
+# 起動時にテーブル作成とマイグレーションを行い、終了時にPDFのワーカーを止める。
+# main.py の読み込み時に行うと、spawn で起動したPDFのワーカーごとに実行されてしまう
+app = FastAPI(on_startup=[init_db], on_shutdown=[shutdown_pdf_executor])
 
+# 画面のサーバーに載せるのは、画面で作成したPDFをトークンで渡すダウンロードだけにする
+download_router = APIRouter()
+
+
+class PlanCreateRequest(BaseModel):
+    patient_id: int
+    main_disease: str
+    sheet_name: str
+    doctor_id: Optional[int] = None
+    doctor_name: Optional[str] = None
+    department: Optional[str] = None
+    creation_count: int = 1
+    target_weight: Optional[float] = None
+
+
+class BatchExportRequest(BaseModel):
+    start_date: Optional[date] = None
+    end_date: Optional[date] = None
+    doctor_id: Optional[int] = None
+    department: Optional[str] = None
+    # 大量の計画書でもメモリ使用量が増えない ZIP を既定にする
+    output_format: str = "zip"
+
+
+class ExcelExportRequest(BaseModel):
+    start_date: Optional[date] = None
+    end_date: Optional[date] = None
+    doctor_id: Optional[int] = None
+    department: Optional[str] = None
+    layout: str = "rows"
+    output_format: str = "xlsx"
+
+
+def pdf_response(data, file_name):
+    # レスポンスを作成し、ヘッダを設定する（日本語のファイル名は RFC 5987 形式で渡す）
+    response = Response(content=data, media_type="application/pdf")
+    response.headers["Content-Disposition"] = (
+        f"attachment; filename=\"plan.pdf\"; filename*=UTF-8''{quote(file_name)}"
+    )
+    response.headers["Cache-Control"] = "no-store"
     return response
+
+
+@download_router.get("/download_pdf/{token}")
+async def download_pdf(token: str):
+    # メモリ上に作成済みのPDFをトークンで取り出す（トークンは1回限り）
+    pdf = pop_pdf(token)
+    if pdf is None:
+        raise HTTPException(status_code=404, detail="PDFが見つからないか、有効期限が切れています")
+    return pdf_response(pdf.data, pdf.file_name)
+
+
+@app.post("/api/plans", status_code=201)
+async def api_create_plan(request: PlanCreateRequest):
+    # 患者IDとテンプレートから計画書を作成する（DB処理はスレッドプールで実行する）
+    try:
+        plan = await run_in_threadpool(create_plan, **request.model_dump())
+    except ValueError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+    return plan_to_dict(plan)
+
+
+@app.get("/api/plans/{plan_id}")
+async def api_get_plan(plan_id: int):
+    plan = await run_in_threadpool(get_plan, plan_id)
+    if plan is None:
+        raise HTTPException(status_code=404, detail=f"計画書ID {plan_id} が見つかりません。")
+    return plan_to_dict(plan)
+
+
+@app.get("/api/plans/{plan_id}/pdf")
+async def api_render_plan(plan_id: int):
+    # 保存済みの計画書をPDFワーカーで作成し直して返す
+    plan = await run_in_threadpool(get_plan, plan_id)
+    if plan is None:
+        raise HTTPException(status_code=404, detail=f"計画書ID {plan_id} が見つかりません。")
+    pdf_data = await render_pdf_async(plan)
+    return pdf_response(pdf_data, f"計画書_{plan.patient_name}.pdf")
+
+
+@app.post("/api/plans/batch")
+async def api_batch_export(request: BatchExportRequest):
+    # 一括出力は件数が多くなるため一時ファイルに書き出し、送信後に削除する
+    if request.output_format not in ("pdf", "zip"):
+        raise HTTPException(status_code=400, detail="output_format は pdf または zip を指定してください")
+    suffix = "." + request.output_format
+    fd, output_path = tempfile.mkstemp(suffix=suffix)
+    os.close(fd)
+    try:
+        await run_in_threadpool(batch_print, output_path, request.start_date, request.end_date,
+                                request.doctor_id, request.department, request.output_format)
+    except ValueError as e:
+        os.remove(output_path)
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception:
+        os.remove(output_path)
+        raise
+    media_type = "application/zip" if request.output_format == "zip" else "application/pdf"
+    return FileResponse(output_path, media_type=media_type, filename="計画書一括" + suffix,
+                        background=BackgroundTask(os.remove, output_path))
+
+
+@app.post("/api/plans/export")
+async def api_excel_export(request: ExcelExportRequest):
+    # 監査用に計画書を Excel に書き出す（1行1件 または 1シート1件）
+    if request.layout not in ("rows", "sheet"):
+        raise HTTPException(status_code=400, detail="layout は rows または sheet を指定してください")
+    if request.output_format not in ("xlsx", "zip"):
+        raise HTTPException(status_code=400, detail="output_format は xlsx または zip を指定してください")
+    suffix = "." + request.output_format
+    fd, output_path = tempfile.mkstemp(suffix=suffix)
+    os.close(fd)
+    try:
+        await run_in_threadpool(export_plans, output_path, request.start_date, request.end_date,
+                                request.doctor_id, request.department, request.layout, request.output_format)
+    except Exception:
+        os.remove(output_path)
+        raise
+    if request.output_format == "zip":
+        media_type = "application/zip"
+    else:
+        media_type = "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
+    return FileResponse(output_path, media_type=media_type, filename="計画書一覧" + suffix,
+                        background=BackgroundTask(os.remove, output_path))
+
+
+@app.get("/metrics", response_class=PlainTextResponse)
+async def metrics():
+    # Prometheus から収集するための計測値
+    return PlainTextResponse(render_prometheus(), media_type="text/plain; version=0.0.4")
+
+
+def mount_flet_app(session_handler):
+    # 画面のサーバー。ダウンロード用のエンドポイントを優先し、それ以外のパスはFletアプリに渡す
+    flet_app = flet_fastapi.FastAPI(on_startup=[init_db], on_shutdown=[shutdown_pdf_executor],
+                                    docs_url=None, redoc_url=None, openapi_url=None)
+    flet_app.include_router(download_router)
+    flet_app.mount("/", flet_fastapi.app(session_handler))
+    return flet_app
+
+
+if __name__ == "__main__":
+    uvicorn.run(app, host=API_HOST, port=API_PORT)
@@ -0,0 +1,63 @@
+import asyncio
+import os
+import shutil
+import sys
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+import reportlab
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT_DIR)
+sys.path.insert(0, os.path.join(ROOT_DIR, "benchmarks"))
+
+# database はインポートした時点の DATABASE_URL でエンジンを作るため、何も読み込まないうちに
+# DBと患者マスタのキャッシュを作業用ディレクトリに向ける（./ldtp_app.db に書き込まないように）
+WORK_DIR = tempfile.mkdtemp(prefix="ldtp_test_")
+os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(WORK_DIR, 'load_test.db')}"
+os.environ["PATIENT_CACHE_DIR"] = os.path.join(WORK_DIR, "patient_cache")
+# IPAexゴシック（ipaexg.ttf）はリポジトリに含まれないため、無ければ reportlab 付属のフォントで代用する
+# （PDFのワーカープロセスは起動時に環境変数を引き継ぐため、ここで設定しておく）
+if "PDF_FONT_PATH" not in os.environ and not os.path.exists("ipaexg.ttf"):
+    os.environ["PDF_FONT_PATH"] = os.path.join(os.path.dirname(reportlab.__file__), "fonts", "Vera.ttf")
+
+from load_test import SimulatedClinician, prepare_environment  # noqa: E402
+
+
+@pytest.fixture(scope="session")
+def app():
+    # 架空の患者マスタと計画書の履歴を作業用ディレクトリに作り、アプリ（main.py）を読み込む
+    prepare_environment(WORK_DIR, patients=50, seed=0, max_plans=3)
+
+    import database
+    assert database.db_url.startswith(f"sqlite:///{WORK_DIR}{os.sep}"), database.db_url
+
+    import main
+    from pdf_service import shutdown_pdf_executor
+    from template_manager import template_manager
+
+    main.PATIENT_ID_SEARCH_DELAY = 0
+    template_manager.load()
+    yield main
+    shutdown_pdf_executor()
+    shutil.rmtree(WORK_DIR, ignore_errors=True)
+
+
+@pytest.fixture
+def open_sessions(app):
+    # 同じイベントループ上で count 個のセッションを開く（ブラウザのタブを並べて開いた状態）
+    def run(count, scenario):
+        async def run_sessions():
+            loop = asyncio.get_running_loop()
+            executor = ThreadPoolExecutor()
+            try:
+                clinicians = [SimulatedClinician(app, loop, executor, [], seed, 0) for seed in range(count)]
+                await asyncio.gather(*(clinician.open() for clinician in clinicians))
+                return await scenario(*clinicians)
+            finally:
+                executor.shutdown()
+
+        return asyncio.run(run_sessions())
+
+    return run
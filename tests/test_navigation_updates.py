@@ -0,0 +1,38 @@
+def patient_with_plans():
+    from database import Session
+    from models import PatientInfo
+
+    session = Session()
+    try:
+        return session.query(PatientInfo.patient_id).order_by(PatientInfo.id).first().patient_id
+    finally:
+        session.close()
+
+
+def test_each_transition_sends_one_update(open_sessions):
+    patient_id = patient_with_plans()
+
+    async def scenario(clinician):
+        await clinician.type_patient_id(patient_id)
+        await clinician.page.settle()
+
+        transitions = [
+            ("create", lambda: clinician.click("新規作成")),
+            ("back_from_create", lambda: clinician.click("戻る")),
+            ("edit", clinician.select_latest_plan),
+            ("back_from_edit", lambda: clinician.click("戻る")),
+            ("template", lambda: clinician.click("テンプレート編集")),
+            ("back_from_template", lambda: clinician.click("戻る")),
+        ]
+        batches = {}
+        for name, transition in transitions:
+            before = clinician.connection.batches
+            await transition()
+            await clinician.page.settle()
+            batches[name] = clinician.connection.batches - before
+        return clinician, batches
+
+    clinician, batches = open_sessions(1, scenario)
+
+    assert batches == {name: 1 for name in batches}
+    assert [view.route for view in clinician.page.views] == ["/"]
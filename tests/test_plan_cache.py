@@ -0,0 +1,31 @@
+from types import SimpleNamespace
+
+from plan_cache import PlanRecordCache, invalidate_plan, invalidation_generation
+
+
+def test_put_many_skips_records_invalidated_while_loading():
+    cache = PlanRecordCache()
+    generation = invalidation_generation()
+    # 一覧を読み込んでいる間に、他のセッションが同じ計画書を更新した
+    invalidate_plan(1)
+    cache.put_many([SimpleNamespace(id=1), SimpleNamespace(id=2)], generation)
+    assert cache.get(1) is None
+    # 更新されていない計画書はそのままキャッシュに入る
+    assert cache.get(2).id == 2
+
+    cache.put_many([SimpleNamespace(id=1)], invalidation_generation())
+    assert cache.get(1).id == 1
+
+
+def test_put_many_skips_everything_loaded_before_forgotten_invalidations(monkeypatch):
+    import plan_cache
+
+    monkeypatch.setattr(plan_cache, "INVALIDATED_PLANS_SIZE", 1)
+    cache = PlanRecordCache()
+    generation = invalidation_generation()
+    # 控えきれずに外れた更新があると、どの計画書が古いか分からないため何も入れない
+    invalidate_plan(1)
+    invalidate_plan(2)
+    cache.put_many([SimpleNamespace(id=1), SimpleNamespace(id=3)], generation)
+    assert cache.get(1) is None
+    assert cache.get(3) is None
@@ -0,0 +1,90 @@
+import asyncio
+
+
+def latest_plans(count):
+    # 計画書があり、氏名が互いに異なる患者の最新の計画書を count 件選ぶ
+    from database import Session
+    from models import PatientInfo
+
+    session = Session()
+    try:
+        plans = {}
+        for plan in session.query(PatientInfo).order_by(PatientInfo.patient_id, PatientInfo.id.desc()):
+            names = {latest.patient_name for latest in plans.values()}
+            if plan.patient_id not in plans and plan.patient_name not in names:
+                plans[plan.patient_id] = plan
+            if len(plans) == count:
+                break
+        return list(plans.values())
+    finally:
+        session.close()
+
+
+def test_parallel_sessions_keep_their_own_selection(open_sessions):
+    first_plan, second_plan = latest_plans(2)
+
+    async def scenario(first, second):
+        await asyncio.gather(first.type_patient_id(first_plan.patient_id),
+                             second.type_patient_id(second_plan.patient_id))
+        await asyncio.gather(first.page.settle(), second.page.settle())
+        await asyncio.gather(first.select_latest_plan(), second.select_latest_plan())
+        await asyncio.gather(first.page.settle(), second.page.settle())
+        await asyncio.gather(first.click("保存"), second.click("保存"))
+        await asyncio.gather(first.page.settle(), second.page.settle())
+        await asyncio.gather(first.click("印刷"), second.click("印刷"))
+        await asyncio.gather(first.page.settle(), second.page.settle())
+        return first, second
+
+    first, second = open_sessions(2, scenario)
+
+    for clinician, own_plan, other_plan in [(first, first_plan, second_plan), (second, second_plan, first_plan)]:
+        state = clinician.page.session.get("state")
+        assert state.selected_row["id"] == str(own_plan.id)
+        assert state.history_patient_id == own_plan.patient_id
+        assert state.plan_records.get(own_plan.id).patient_id == own_plan.patient_id
+        assert state.plan_records.get(other_plan.id) is None
+        assert [file_name for _, file_name in clinician.page.launched_urls] == [
+            f"計画書_{own_plan.patient_name}.pdf"]
+
+    # 保存は各セッションが選択した計画書だけを更新する
+    from database import Session
+    from models import PatientInfo
+
+    session = Session()
+    try:
+        for plan in (first_plan, second_plan):
+            assert session.get(PatientInfo, plan.id).patient_id == plan.patient_id
+    finally:
+        session.close()
+
+
+def test_delete_removes_only_the_selected_plan(open_sessions):
+    async def scenario(first, second):
+        # 後からコピーした2人目の計画書が、表全体で最新の計画書になる
+        for clinician in (first, second):
+            await clinician.click("前回コピー")
+            await clinician.page.settle()
+        await asyncio.gather(first.select_latest_plan(), second.select_latest_plan())
+        await asyncio.gather(first.page.settle(), second.page.settle())
+        first_copy_id, second_copy_id = [int(clinician.page.session.get("state").selected_row["id"])
+                                         for clinician in (first, second)]
+        await first.click("削除")
+        await first.page.settle()
+        return first, first_copy_id, second_copy_id
+
+    first, first_copy_id, second_copy_id = open_sessions(2, scenario)
+
+    assert first_copy_id < second_copy_id
+    assert first.page.session.get("state").selected_row is None
+    from database import Session
+    from models import PatientInfo
+
+    session = Session()
+    try:
+        assert session.get(PatientInfo, first_copy_id) is None
+        second_copy = session.get(PatientInfo, second_copy_id)
+        assert second_copy is not None
+        session.delete(second_copy)
+        session.commit()
+    finally:
+        session.close()
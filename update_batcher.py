@@ -0,0 +1,63 @@
+import json
+import os
+import threading
+
+from flet_core.page import PageDisconnectedException
+from flet_core.protocol import CommandEncoder
+
+from metrics import counter, timer
+
+# 1 にすると画面へ送信した量（バイト）を数える。送信のたびにJSONへの変換が1回増えるため、計測するときだけ有効にする
+UI_BYTES_METRICS = int(os.environ.get("UI_BYTES_METRICS", 0))
+
+
+class UpdateBatcher:
+    # セッションの page.update() を置き換え、同じイベントループの1周の間に何度呼ばれても送信は1回にまとめる。
+    # ハンドラの中で続けて page.update() を呼んでも、最後の状態だけが差分として送られる。
+    def __init__(self, page, count_bytes=UI_BYTES_METRICS):
+        self.page = page
+        self.loop = page.loop
+        self.pending = False
+        self.requests = 0
+        self.flushes = 0
+        self.bytes_sent = 0
+        self._update = page.update
+        self._lock = threading.Lock()
+        if count_bytes:
+            self._count_sent_bytes(page.connection)
+        page.update = self.request
+
+    def _count_sent_bytes(self, connection):
+        send_commands = connection.send_commands
+
+        def counting_send_commands(session_id, commands):
+            if commands:
+                size = len(json.dumps(commands, cls=CommandEncoder, separators=(",", ":")))
+                self.bytes_sent += size
+                counter("ui_bytes_sent_total", "画面へ送信した更新の量（バイト）").inc(size)
+            return send_commands(session_id, commands)
+
+        connection.send_commands = counting_send_commands
+
+    def request(self, *controls):
+        # 一部の部品だけの更新もページ全体の差分送信にまとめる（変更のない部品は送られない）
+        counter("ui_update_requests_total", "page.update() の呼び出し回数").inc()
+        with self._lock:
+            self.requests += 1
+            if self.pending:
+                return
+            self.pending = True
+        self.loop.call_soon_threadsafe(self.flush)
+
+    def flush(self):
+        with self._lock:
+            if not self.pending:
+                return
+            self.pending = False
+        try:
+            with timer("page_update_seconds", "page.update() の送信にかかった時間"):
+                self._update()
+        except PageDisconnectedException:
+            return
+        self.flushes += 1
+        counter("ui_flushes_total", "画面への更新の送信回数").inc()